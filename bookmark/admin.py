@@ -1,7 +1,17 @@
 from django.contrib import admin
+from import_export.admin import ImportExportModelAdmin
+
+from .models import Category, DomainFavicon, Item, MetadataJob, Tag
+from .resources import ItemResource
+
+
+class ItemAdmin(ImportExportModelAdmin):
+    resource_classes = [ItemResource]
+    list_filter = ("link_broken",)
 
-from .models import Category, Item, Tag
 
 admin.site.register(Category)
 admin.site.register(Tag)
-admin.site.register(Item)
+admin.site.register(Item, ItemAdmin)
+admin.site.register(MetadataJob)
+admin.site.register(DomainFavicon)
@@ -0,0 +1,216 @@
+"""ブックマークの REST API（ブラウザ拡張・スクリプトからの同期用）
+
+- 一覧はカーソルページング（件数の COUNT や OFFSET を使わない）
+- ?fields=id,url,title で返すフィールドを絞り込める（不要な JOIN・先読みも省く）
+- GET の応答には ETag を付け、If-None-Match が一致すれば 304 を返す
+- POST /api/items/bulk/ で最大 BULK_MAX_ITEMS 件をまとめて登録・更新する
+"""
+
+import hashlib
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import HttpResponseNotModified
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from . import facets, search, sidebar
+from .importer import ImportedBookmark, create_bookmarks
+from .models import Category, Item, Tag, new_render_version
+from .serializers import (
+    BulkItemSerializer,
+    CategorySerializer,
+    ItemSerializer,
+    SparseFieldsMixin,
+    TagSerializer,
+)
+from .taxonomy import resolve_categories, resolve_tags
+from .urlnorm import url_hash
+
+BULK_MAX_ITEMS = 500
+
+
+class IdCursorPagination(CursorPagination):
+    ordering = "-id"
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+
+class ETagMixin:
+    """GET の応答本文のハッシュを ETag にし、変わっていなければ 304 を返す"""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in ("GET", "HEAD") or response.status_code != 200:
+            return response
+        response.render()
+        etag = '"%s"' % hashlib.sha256(response.content).hexdigest()[:32]
+        if etag in request.headers.get("If-None-Match", ""):
+            not_modified = HttpResponseNotModified()
+            not_modified["ETag"] = etag
+            return not_modified
+        response["ETag"] = etag
+        return response
+
+
+class TagViewSet(ETagMixin, viewsets.ModelViewSet):
+    queryset = Tag.objects.all()
+    serializer_class = TagSerializer
+    pagination_class = IdCursorPagination
+    permission_classes = [permissions.IsAuthenticated]
+
+
+class CategoryViewSet(ETagMixin, viewsets.ModelViewSet):
+    queryset = Category.objects.all()
+    serializer_class = CategorySerializer
+    pagination_class = IdCursorPagination
+    permission_classes = [permissions.IsAuthenticated]
+
+
+class ItemViewSet(ETagMixin, viewsets.ModelViewSet):
+    serializer_class = ItemSerializer
+    pagination_class = IdCursorPagination
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = Item.objects.all()
+        fields = SparseFieldsMixin.requested_fields(self.request)
+        if fields is None or "category" in fields:
+            queryset = queryset.select_related("category")
+        if fields is None or "tags" in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch("tags", queryset=Tag.objects.only("id", "name"))
+            )
+        if fields is not None:
+            # 使わないカラムは読み込まない（カーソルに使う id は常に必要）
+            model_fields = {field.name for field in Item._meta.concrete_fields}
+            columns = {"id"} | (fields & model_fields)
+            if "category" in fields:
+                columns.add("category__name")
+            queryset = queryset.only(*columns)
+
+        params = self.request.query_params
+        if params.get("category"):
+            queryset = queryset.filter(category__name=params["category"])
+        if params.get("tag"):
+            queryset = queryset.filter(tags__name=params["tag"])
+        if params.get("url"):
+            queryset = queryset.filter(url_hash=url_hash(params["url"]))
+        if params.get("q"):
+            queryset = queryset.filter(
+                id__in=search.search_ids(params["q"], limit=1000)
+            )
+        return queryset
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """URL をキーにまとめて登録・更新する
+
+        登録済みの URL（正規化して比較）は指定したフィールドだけを更新し、
+        新しい URL はメタデータを取得せずに登録してジョブに回す。
+        """
+        if not isinstance(request.data, list):
+            return Response(
+                {"detail": "A list of items is required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(request.data) > BULK_MAX_ITEMS:
+            return Response(
+                {"detail": f"At most {BULK_MAX_ITEMS} items per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        serializer = BulkItemSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        results = bulk_upsert(serializer.validated_data)
+        return Response({"results": results})
+
+
+def _update_tags(items_tags: dict) -> None:
+    """{item: [タグ名]} の通りにタグを付け替える（件数もまとめて更新する）"""
+    if not items_tags:
+        return
+    tags = resolve_tags(name for names in items_tags.values() for name in names)
+    Through = Item.tags.through
+    ids = [item.id for item in items_tags]
+    old = Counter(
+        Through.objects.filter(item_id__in=ids).values_list("tag_id", flat=True)
+    )
+    Through.objects.filter(item_id__in=ids).delete()
+    links = [
+        Through(item_id=item.id, tag_id=tags[name].id)
+        for item, names in items_tags.items()
+        for name in {name.strip() for name in names}
+        if name in tags
+    ]
+    Through.objects.bulk_create(links)
+    delta = Counter(link.tag_id for link in links)
+    delta.subtract(old)
+    facets.add_tag_counts(delta)
+
+
+@transaction.atomic
+def bulk_upsert(entries) -> list:
+    hashes = [url_hash(entry["url"]) for entry in entries]
+    # 同じ URL が複数ある場合は最も古いアイテムを更新する
+    existing = {
+        item.url_hash: item
+        for item in Item.objects.filter(url_hash__in=set(hashes)).order_by("-id")
+    }
+    categories = resolve_categories(
+        entry["category"] for entry in entries if entry.get("category")
+    )
+
+    results = []
+    new = {}
+    updated = {}
+    items_tags = {}
+    category_delta = Counter()
+    for entry, digest in zip(entries, hashes):
+        item = existing.get(digest)
+        if item is None:
+            if digest not in new:
+                new[digest] = ImportedBookmark(
+                    url=entry["url"],
+                    title=entry.get("title", ""),
+                    description=entry.get("description", ""),
+                    category=entry.get("category", ""),
+                    tags=entry.get("tags", []),
+                )
+            results.append({"url": entry["url"], "status": "created", "hash": digest})
+            continue
+        for field in ("title", "description"):
+            if field in entry:
+                setattr(item, field, entry[field])
+        if "category" in entry:
+            category = categories.get(entry["category"].strip())
+            category_id = category.id if category else None
+            if category_id != item.category_id:
+                category_delta.update({item.category_id: -1, category_id: 1})
+                item.category_id = category_id
+        if "tags" in entry:
+            items_tags[item] = entry["tags"]
+        item.render_version = new_render_version()
+        updated[item.id] = item
+        results.append({"url": entry["url"], "id": item.id, "status": "updated"})
+
+    if updated:
+        Item.objects.bulk_update(
+            list(updated.values()),
+            ["title", "description", "category", "render_version"],
+        )
+        search.index_items(list(updated))
+        if category_delta:
+            facets.add_category_counts(category_delta)
+            transaction.on_commit(sidebar.invalidate)
+    _update_tags(items_tags)
+
+    created = create_bookmarks(list(zip(new.values(), new.keys())))
+    ids = {item.url_hash: item.id for item in created}
+    for result in results:
+        if "hash" in result:
+            result["id"] = ids[result.pop("hash")]
+    return results
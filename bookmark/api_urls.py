@@ -0,0 +1,10 @@
+from rest_framework.routers import DefaultRouter
+
+from . import api
+
+router = DefaultRouter()
+router.register("items", api.ItemViewSet, basename="item")
+router.register("tags", api.TagViewSet)
+router.register("categories", api.CategoryViewSet)
+
+urlpatterns = router.urls
@@ -0,0 +1,109 @@
+"""ブックマークのエクスポート
+
+アイテムは iterator(chunk_size=...) で少しずつ読み込み、カテゴリとタグもチャンクごとに
+まとめて取得する。出力も1行ずつ生成するので、件数に関係なく一定のメモリで書き出せる。
+JSON Lines と Netscape 形式の HTML は importer でそのまま読み込める。
+"""
+
+import csv
+import json
+from html import escape
+
+from .models import Item
+
+CHUNK_SIZE = 1000
+CSV_FIELDS = ("url", "title", "description", "category", "tags", "created_at")
+FORMATS = {
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "csv": ("text/csv", "csv"),
+    "html": ("text/html", "html"),
+}
+
+
+def export_queryset(queryset=None):
+    queryset = Item.objects.all() if queryset is None else queryset
+    return (
+        queryset.select_related("category")
+        .prefetch_related("tags")
+        .only("id", "url", "title", "description", "created_at", "category__name")
+    )
+
+
+def iter_items(queryset=None, chunk_size=CHUNK_SIZE, order_by=("id",)):
+    return export_queryset(queryset).order_by(*order_by).iterator(chunk_size=chunk_size)
+
+
+def _row(item) -> dict:
+    return {
+        "url": item.url,
+        "title": item.title,
+        "description": item.description,
+        "category": item.category.name if item.category else "",
+        "tags": [tag.name for tag in item.tags.all()],
+        "created_at": item.created_at.isoformat(),
+    }
+
+
+def export_jsonl(queryset=None, chunk_size=CHUNK_SIZE):
+    for item in iter_items(queryset, chunk_size):
+        yield json.dumps(_row(item), ensure_ascii=False) + "\n"
+
+
+class _Echo:
+    """csv.writer の書き込み先。書き込んだ行をそのまま返す"""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(queryset=None, chunk_size=CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_FIELDS)
+    for item in iter_items(queryset, chunk_size):
+        row = _row(item)
+        row["tags"] = ",".join(row["tags"])
+        yield writer.writerow([row[field] for field in CSV_FIELDS])
+
+
+def export_netscape(queryset=None, chunk_size=CHUNK_SIZE):
+    """Netscape 形式の HTML。カテゴリをフォルダとして出力する"""
+    yield (
+        "<!DOCTYPE NETSCAPE-Bookmark-file-1>\n"
+        '<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n'
+        "<TITLE>Bookmarks</TITLE>\n"
+        "<H1>Bookmarks</H1>\n"
+        "<DL><p>\n"
+    )
+    # フォルダごとにまとめて出力するため、カテゴリ順に並べる
+    items = iter_items(queryset, chunk_size, order_by=("category__name", "id"))
+    folder = None
+    for item in items:
+        category = item.category.name if item.category else ""
+        if category != folder:
+            if folder:
+                yield "    </DL><p>\n"
+            if category:
+                yield f"    <DT><H3>{escape(category)}</H3>\n    <DL><p>\n"
+            folder = category
+        indent = "        " if category else "    "
+        tags = ",".join(tag.name for tag in item.tags.all())
+        attrs = f' ADD_DATE="{int(item.created_at.timestamp())}"'
+        if tags:
+            attrs += f' TAGS="{escape(tags)}"'
+        yield (
+            f'{indent}<DT><A HREF="{escape(item.url)}"{attrs}>'
+            f"{escape(item.title)}</A>\n"
+        )
+        if item.description:
+            yield f"{indent}<DD>{escape(item.description)}\n"
+    if folder:
+        yield "    </DL><p>\n"
+    yield "</DL><p>\n"
+
+
+EXPORTERS = {"jsonl": export_jsonl, "csv": export_csv, "html": export_netscape}
+
+
+def export(format, queryset=None, chunk_size=CHUNK_SIZE):
+    """指定した形式で出力する文字列を順に返す"""
+    return EXPORTERS[format](queryset, chunk_size)
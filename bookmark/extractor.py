@@ -0,0 +1,180 @@
+"""HTML の <head> だけを逐次読み込んでメタデータを取り出す
+
+ページ全体をダウンロードして DOM を組み立てる代わりに、レスポンスをチャンク単位で
+lxml のインクリメンタルパーサーに渡し、</head>（または <body> の開始）に達するか
+上限バイト数を読んだ時点で打ち切る。
+"""
+
+import codecs
+import hashlib
+import re
+from dataclasses import dataclass, field
+from urllib.parse import urljoin
+
+from charset_normalizer import from_bytes
+from lxml import etree
+
+CHUNK_SIZE = 16 * 1024
+# <head> がこれより大きいページは途中までの情報で諦める
+MAX_HEAD_BYTES = 1024 * 1024
+# 文字コードの <meta> を探す範囲（HTML 仕様のプリスキャンと同じ 1024 バイト）
+PRESCAN_BYTES = 1024
+
+OG_PROPERTIES = ("title", "description", "image", "type", "site_name", "url")
+
+_HEADER_CHARSET_RE = re.compile(r"charset=[\"']?([\w.:-]+)", re.I)
+_META_CHARSET_RE = re.compile(rb"<meta[^>]+charset=[\"']?([\w.:-]+)", re.I)
+# サーバーが既定値として返しがちで、実際の文字コードを表していないことが多い
+_UNRELIABLE_HEADER_CHARSETS = {"iso8859-1", "ascii"}
+# 宣言がない場合に順に試す文字コード（日本語サイトで多いもの）
+FALLBACK_CHARSETS = ("utf-8", "euc_jp", "cp932")
+
+
+@dataclass
+class PageMetadata:
+    title: str = ""
+    description: str = ""
+    favicon_url: str = ""
+    og: dict = field(default_factory=dict)
+    # 読み込んだ範囲（<head> まで）の SHA-256
+    digest: str = ""
+
+
+def _lookup(encoding):
+    if isinstance(encoding, bytes):
+        encoding = encoding.decode("ascii", errors="ignore")
+    try:
+        info = codecs.lookup(encoding)
+    except LookupError:
+        return None
+    # base64 や rot13 などテキストの文字コードでないものは使えない
+    if not getattr(info, "_is_text_encoding", True):
+        return None
+    return info.name
+
+
+def header_charset(content_type):
+    match = _HEADER_CHARSET_RE.search(content_type or "")
+    if not match:
+        return None
+    encoding = _lookup(match.group(1))
+    if encoding in _UNRELIABLE_HEADER_CHARSETS:
+        return None
+    return encoding
+
+
+def sniff_charset(prefix: bytes) -> str:
+    """<meta charset> のプリスキャン、候補の文字コードでのデコード、推定の順に決める"""
+    match = _META_CHARSET_RE.search(prefix[:PRESCAN_BYTES])
+    if match:
+        encoding = _lookup(match.group(1))
+        if encoding:
+            return encoding
+    for encoding in FALLBACK_CHARSETS:
+        try:
+            # 末尾で切れたマルチバイト文字は無視して判定する
+            codecs.getincrementaldecoder(encoding)().decode(prefix)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    guess = from_bytes(prefix).best()
+    # 宣言も推定も使えない文字コードの場合は UTF-8 として読む
+    return (_lookup(guess.encoding) if guess else None) or "utf-8"
+
+
+class _HeadCollector:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.page = PageMetadata()
+        self.done = False
+
+    def start(self, element):
+        tag = element.tag if isinstance(element.tag, str) else ""
+        if tag == "body":
+            self.done = True
+        elif tag == "meta":
+            self._meta(element.attrib)
+        elif tag == "link":
+            self._link(element.attrib)
+
+    def end(self, element):
+        tag = element.tag if isinstance(element.tag, str) else ""
+        if tag == "head":
+            self.done = True
+        elif tag == "title" and not self.page.title:
+            self.page.title = (element.text or "").strip()
+
+    def _meta(self, attrib):
+        content = (attrib.get("content") or "").strip()
+        if not content:
+            return
+        key = (attrib.get("property") or attrib.get("name") or "").strip().lower()
+        if key.startswith("og:"):
+            name = key[3:]
+            if name in OG_PROPERTIES and name not in self.page.og:
+                self.page.og[name] = content
+        elif key == "description" and not self.page.description:
+            self.page.description = content
+
+    def _link(self, attrib):
+        rel = (attrib.get("rel") or "").lower().split()
+        href = (attrib.get("href") or "").strip()
+        if "icon" in rel and href and not self.page.favicon_url:
+            self.page.favicon_url = urljoin(self.base_url, href)
+
+
+def extract_metadata(response, base_url=None, max_bytes=MAX_HEAD_BYTES) -> PageMetadata:
+    """stream=True で取得したレスポンスから <head> のメタデータを取り出す
+
+    読み終えたら（途中で打ち切った場合も）レスポンスを閉じる。
+    """
+    collector = _HeadCollector(base_url or response.url)
+    parser = etree.HTMLPullParser(events=("start", "end"))
+    digest = hashlib.sha256()
+    encoding = header_charset(response.headers.get("Content-Type"))
+    decoder = None
+    pending = b""
+    size = 0
+
+    def feed(data: bytes, final=False):
+        text = decoder.decode(data, final)
+        if text:
+            parser.feed(text)
+        for event, element in parser.read_events():
+            getattr(collector, event)(element)
+
+    try:
+        for chunk in response.iter_content(CHUNK_SIZE):
+            size += len(chunk)
+            digest.update(chunk)
+            if decoder is None:
+                # 文字コードが分かるまで先頭を貯めておく
+                pending += chunk
+                if not encoding and len(pending) < PRESCAN_BYTES:
+                    continue
+                encoding = encoding or sniff_charset(pending)
+                decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+                chunk, pending = pending, b""
+            feed(chunk)
+            if collector.done or size >= max_bytes:
+                break
+        else:
+            if decoder is None:
+                encoding = encoding or sniff_charset(pending)
+                decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            feed(pending, final=True)
+    finally:
+        response.close()
+
+    if not collector.done:
+        # 途中で打ち切った場合も閉じていない要素のイベントを回収する
+        try:
+            parser.close()
+        except etree.XMLSyntaxError:
+            pass
+        for event, element in parser.read_events():
+            getattr(collector, event)(element)
+
+    page = collector.page
+    page.digest = digest.hexdigest()
+    return page
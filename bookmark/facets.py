@@ -0,0 +1,68 @@
+"""タグ・カテゴリごとのアイテム数（絞り込み用の件数）
+
+件数は Tag.item_count / Category.item_count に持ち、アイテムの追加・削除や
+タグの付け外しのたびに signals で増減させる。表示のたびに集計する必要がなく、
+上位 N 件のタグもインデックスを使って取得できる。
+シグナルが発行されない一括処理では呼び出し側で add_* を呼び、ずれが出た場合は
+reconcile_facet_counts コマンド（reconcile）で実際の件数に合わせる。
+"""
+
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import Category, Tag
+
+
+def _apply(model, counts) -> None:
+    """{pk: 増減数} を、増減数ごとに1回の UPDATE で反映する"""
+    by_delta = defaultdict(list)
+    for pk, delta in Counter(counts).items():
+        if pk is not None and delta:
+            by_delta[delta].append(pk)
+    for delta, pks in by_delta.items():
+        # 補正前のずれで負にならないようにする
+        model.objects.filter(pk__in=pks).update(
+            item_count=Greatest(F("item_count") + delta, 0)
+        )
+
+
+def add_tag_counts(counts) -> None:
+    _apply(Tag, counts)
+
+
+def add_category_counts(counts) -> None:
+    _apply(Category, counts)
+
+
+def top_tags(limit=20) -> list:
+    return list(
+        Tag.objects.filter(item_count__gt=0)
+        .order_by("-item_count", "name")
+        .values("id", "name", "item_count")[:limit]
+    )
+
+
+def category_counts() -> list:
+    return list(Category.objects.order_by("id").values("id", "name", "item_count"))
+
+
+def _reconcile(model, related) -> int:
+    stale = list(
+        model.objects.annotate(actual=Count(related))
+        .exclude(item_count=F("actual"))
+        .only("id")
+    )
+    for obj in stale:
+        obj.item_count = obj.actual
+    model.objects.bulk_update(stale, ["item_count"], batch_size=1000)
+    return len(stale)
+
+
+def reconcile() -> dict:
+    """件数を実際の集計値に合わせ、補正した件数を返す"""
+    return {
+        "tags": _reconcile(Tag, "tags"),
+        "categories": _reconcile(Category, "item"),
+    }
@@ -1,11 +1,20 @@
 from django import forms
+from django.urls import reverse_lazy
 
 from .models import Item
 
 
 class BookmarkForm(forms.ModelForm):
     new_category = forms.CharField(required=False)
-    new_tags = forms.CharField(required=False)
+    new_tags = forms.CharField(
+        required=False,
+        widget=forms.TextInput(
+            attrs={
+                "data-tag-autocomplete": reverse_lazy("bookmark:tag_autocomplete"),
+                "autocomplete": "off",
+            }
+        ),
+    )
     
     # OGP関連の隠しフィールド
     og_title = forms.CharField(widget=forms.HiddenInput(), required=False)
@@ -18,3 +27,20 @@ class BookmarkForm(forms.ModelForm):
     class Meta:
         model = Item
         fields = ("url", "title", "category", "tags", "description")
+
+
+class ImportForm(forms.Form):
+    file = forms.FileField(label="ファイル")
+    format = forms.ChoiceField(
+        label="形式",
+        choices=[
+            ("", "拡張子から判定"),
+            ("html", "HTML（Netscape 形式）"),
+            ("json", "JSON"),
+            ("jsonl", "JSON Lines"),
+        ],
+        required=False,
+    )
+    category = forms.CharField(
+        label="フォルダがない場合のカテゴリ", max_length=200, required=False
+    )
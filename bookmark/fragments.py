@@ -0,0 +1,93 @@
+"""一覧のカード・行の HTML 断片のキャッシュ
+
+アイテムの id と render_version をキーに描画結果を共有キャッシュに保存し、
+リクエストやユーザーをまたいで使い回す。render_version は表示に関わる変更
+（アイテムの保存、タグの付け替え、タグ・カテゴリの名前の変更）のたびに新しい値になるので、
+古い断片は参照されなくなり、期限切れで消える。
+
+ページ内のアイテムはまとめて get_many / set_many する。これが1往復で済むのは
+memcached や Redis だけで、データベースのキャッシュではキーごとに問い合わせるため
+描画し直すより遅くなる。そのため settings.FRAGMENT_CACHE が有効なとき
+（既定では CACHE_URL が memcached か Redis のとき）だけキャッシュを使う。
+ヒット数・ミス数はプロセスごとにメモリ上で数え、stats() で確認できる。
+"""
+
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch, prefetch_related_objects
+from django.template.loader import get_template
+
+from .models import Item, Tag, new_render_version
+
+TEMPLATES = {
+    "card": "bookmark/components/card.html",
+    "list": "bookmark/components/list.html",
+}
+TIMEOUT = 60 * 60 * 24 * 7
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def fragment_key(item, layout) -> str:
+    return f"item_fragment:{layout}:{item.pk}:{item.render_version}"
+
+
+def render_items(items, layout) -> list:
+    """アイテムごとの HTML を返す。キャッシュにないものだけを描画する"""
+    items = list(items)
+    if not settings.FRAGMENT_CACHE:
+        return _render(items, layout)
+    keys = [fragment_key(item, layout) for item in items]
+    fragments = cache.get_many(keys)
+    misses = [item for item, key in zip(items, keys) if key not in fragments]
+    if misses:
+        rendered = dict(
+            zip(
+                [fragment_key(item, layout) for item in misses], _render(misses, layout)
+            )
+        )
+        cache.set_many(rendered, TIMEOUT)
+        fragments.update(rendered)
+    with _stats_lock:
+        _stats.update(hits=len(items) - len(misses), misses=len(misses))
+    return [fragments[key] for key in keys]
+
+
+def _render(items, layout) -> list:
+    prefetch_related_objects(
+        items, Prefetch("tags", queryset=Tag.objects.only("id", "name"))
+    )
+    template = get_template(TEMPLATES[layout])
+    return [template.render({"item": item}) for item in items]
+
+
+def bump(item_ids) -> int:
+    """アイテムの render_version を新しくして、キャッシュした断片を使わないようにする
+
+    item_ids には id のリストのほか values_list のクエリセットも渡せる。新しい値を返す。
+    """
+    version = new_render_version()
+    Item.objects.filter(id__in=item_ids).update(render_version=version)
+    return version
+
+
+def stats() -> dict:
+    """このプロセスでのヒット数・ミス数（起動してから、または reset_stats() から）"""
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {
+        "enabled": settings.FRAGMENT_CACHE,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else None,
+    }
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,372 @@
+"""ブラウザのブックマークのエクスポートファイルの一括インポート
+
+ファイルはチャンク単位で読み込みながら解析し、batch_size 件ごとにまとめて登録するため、
+件数が多くてもメモリ使用量は一定に保たれる。
+
+- Netscape 形式の HTML（Chrome / Firefox / Safari などのエクスポート）
+- JSON Lines（1行1件。url, title, description, category, tags, created_at）
+- JSON（Chrome の Bookmarks ファイル、Firefox のバックアップ、上記オブジェクトの配列）
+
+JSON は標準ライブラリに逐次パーサーがないため、ファイル全体を読み込んでから解析する。
+登録したアイテムのメタデータ取得はジョブとして登録し、ワーカーに任せる。
+"""
+
+import io
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+from itertools import islice
+from urllib.parse import urlsplit
+
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.db import transaction
+from django.utils import timezone as django_timezone
+
+from . import facets, search, sidebar
+from .models import Item, MetadataJob
+from .taxonomy import resolve_categories, resolve_tags
+from .urlnorm import url_hash
+
+CHUNK_SIZE = 64 * 1024
+BATCH_SIZE = 1000
+URL_MAX_LENGTH = 2000
+TITLE_MAX_LENGTH = 512
+FORMATS = ("html", "jsonl", "json")
+# 1601-01-01 から 1970-01-01 までのマイクロ秒
+CHROME_EPOCH_OFFSET = 11644473600 * 1000000
+
+
+@dataclass
+class ImportedBookmark:
+    url: str
+    title: str = ""
+    description: str = ""
+    category: str = ""
+    tags: list = field(default_factory=list)
+    created_at: datetime = None
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    skipped: int = 0
+
+
+def _timestamp(value, divisor=1):
+    """UNIX 時刻を datetime に変換する（divisor で秒に換算する）"""
+    try:
+        seconds = int(value) / divisor
+        return datetime.fromtimestamp(seconds, tz=timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+
+
+def _split_tags(value) -> list:
+    if isinstance(value, (list, tuple)):
+        return [str(tag) for tag in value]
+    return [tag for tag in (value or "").split(",") if tag.strip()]
+
+
+class _NetscapeParser(HTMLParser):
+    """<DT><H3> をフォルダ、<DT><A> をブックマークとして読み取る"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.folders = []
+        self.bookmarks = []
+        self._folder_name = None
+        self._text = None
+        self._bookmark = None
+        self._pending_folder = None
+        self._in_description = False
+        # 直前の要素がブックマークの場合だけ <DD> をその説明として扱う
+        self._after_bookmark = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "h3":
+            self._finish_description()
+            self._after_bookmark = False
+            self._text = []
+            self._folder_name = True
+        elif tag == "a":
+            self._finish_description()
+            attrs = dict(attrs)
+            created_at = _timestamp(attrs.get("add_date"))
+            self._bookmark = ImportedBookmark(
+                url=(attrs.get("href") or "").strip(),
+                category=self.folders[-1] if self.folders else "",
+                tags=_split_tags(attrs.get("tags")),
+                created_at=created_at,
+            )
+            self._text = []
+        elif tag == "dl":
+            self._finish_description()
+            self._after_bookmark = False
+            # 直前の <H3> がこの <DL> のフォルダ名
+            self.folders.append(self._pending_folder or "")
+            self._pending_folder = None
+        elif tag == "dd" and self._after_bookmark:
+            self._after_bookmark = False
+            self._in_description = True
+            self._text = []
+        elif tag == "dt":
+            self._finish_description()
+
+    def handle_endtag(self, tag):
+        if tag == "h3" and self._folder_name:
+            self._pending_folder = "".join(self._text).strip()
+            self._folder_name = None
+            self._text = None
+        elif tag == "a" and self._bookmark is not None:
+            self._bookmark.title = "".join(self._text).strip()
+            self.bookmarks.append(self._bookmark)
+            self._bookmark = None
+            self._text = None
+            self._after_bookmark = True
+        elif tag == "dl":
+            self._finish_description()
+            if self.folders:
+                self.folders.pop()
+
+    def handle_data(self, data):
+        if self._text is not None:
+            self._text.append(data)
+
+    def _finish_description(self):
+        if self._in_description:
+            self.bookmarks[-1].description = "".join(self._text).strip()
+            self._in_description = False
+            self._text = None
+
+
+def parse_netscape(stream):
+    parser = _NetscapeParser()
+    while chunk := stream.read(CHUNK_SIZE):
+        parser.feed(chunk)
+        if len(parser.bookmarks) > 1:
+            # 最後の1件は <DD> の説明が続く可能性があるので残しておく
+            yield from parser.bookmarks[:-1]
+            del parser.bookmarks[:-1]
+    parser.close()
+    parser._finish_description()
+    yield from parser.bookmarks
+
+
+def _from_dict(data: dict) -> ImportedBookmark:
+    created_at = data.get("created_at")
+    if isinstance(created_at, str):
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except ValueError:
+            created_at = None
+        if created_at and created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+    elif created_at is not None:
+        created_at = _timestamp(created_at)
+    return ImportedBookmark(
+        url=str(data.get("url") or "").strip(),
+        title=str(data.get("title") or ""),
+        description=str(data.get("description") or ""),
+        category=str(data.get("category") or ""),
+        tags=_split_tags(data.get("tags")),
+        created_at=created_at,
+    )
+
+
+def parse_jsonl(stream):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            yield _from_dict(data)
+
+
+def _chrome_timestamp(value):
+    """Chrome の日時（1601-01-01 起点のマイクロ秒）"""
+    try:
+        return _timestamp(int(value) - CHROME_EPOCH_OFFSET, 1000000)
+    except (TypeError, ValueError):
+        return None
+
+
+def _walk_chrome(node, folder=""):
+    if node.get("type") == "url":
+        yield ImportedBookmark(
+            url=node.get("url", ""),
+            title=node.get("name", ""),
+            category=folder,
+            created_at=_chrome_timestamp(node.get("date_added")),
+        )
+    for child in node.get("children", []):
+        yield from _walk_chrome(child, node.get("name", folder))
+
+
+def _walk_firefox(node, folder=""):
+    if node.get("type") == "text/x-moz-place":
+        yield ImportedBookmark(
+            url=node.get("uri", ""),
+            title=node.get("title", ""),
+            category=folder,
+            tags=_split_tags(node.get("tags")),
+            # マイクロ秒
+            created_at=_timestamp(node.get("dateAdded"), 1000000),
+        )
+    for child in node.get("children", []):
+        yield from _walk_firefox(child, node.get("title", folder))
+
+
+def parse_json(stream):
+    data = json.load(stream)
+    if isinstance(data, list):
+        for entry in data:
+            if isinstance(entry, dict):
+                yield _from_dict(entry)
+    elif isinstance(data, dict) and "roots" in data:
+        for root in data["roots"].values():
+            if isinstance(root, dict):
+                yield from _walk_chrome(root)
+    elif isinstance(data, dict):
+        yield from _walk_firefox(data)
+
+
+PARSERS = {"html": parse_netscape, "jsonl": parse_jsonl, "json": parse_json}
+
+
+def detect_format(filename: str) -> str:
+    name = (filename or "").lower()
+    if name.endswith(".jsonl") or name.endswith(".ndjson"):
+        return "jsonl"
+    if name.endswith(".json"):
+        return "json"
+    return "html"
+
+
+def open_text(file):
+    """バイナリのファイル（アップロードされたファイルなど）をテキストとして読む"""
+    if isinstance(file, io.TextIOBase):
+        return file
+    return io.TextIOWrapper(file, encoding="utf-8", errors="replace")
+
+
+validate_url = URLValidator(schemes=["http", "https"])
+
+
+def _valid(bookmark: ImportedBookmark) -> bool:
+    if len(bookmark.url) > URL_MAX_LENGTH:
+        return False
+    try:
+        validate_url(bookmark.url)
+        # URLValidator は範囲外のポート（:99999 など）を通すので、解析できるかも確認する
+        urlsplit(bookmark.url).port
+    except (ValidationError, ValueError):
+        return False
+    return True
+
+
+def _import_batch(bookmarks, default_category) -> ImportResult:
+    # 前のバッチで登録したものはデータベースの検索で見つかるので、
+    # ファイル内の重複の確認にはバッチ内の URL だけを覚えておけばよい
+    result = ImportResult()
+    hashes = [url_hash(bookmark.url) for bookmark in bookmarks]
+    seen = set(
+        Item.objects.filter(url_hash__in=set(hashes))
+        .values_list("url_hash", flat=True)
+        .distinct()
+    )
+    new = []
+    for bookmark, digest in zip(bookmarks, hashes):
+        if digest in seen:
+            result.skipped += 1
+            continue
+        seen.add(digest)
+        new.append((bookmark, digest))
+    if new:
+        result.created = len(create_bookmarks(new, default_category))
+    return result
+
+
+def create_bookmarks(new, default_category="") -> list:
+    """(ImportedBookmark, url_hash) のリストからアイテムをまとめて作成し、作成したアイテムを返す
+
+    重複の確認は呼び出し側で行う。メタデータは取得せずジョブとして登録する。
+    """
+    categories = resolve_categories(
+        bookmark.category or default_category for bookmark, _ in new
+    )
+    tags = resolve_tags(tag for bookmark, _ in new for tag in bookmark.tags)
+
+    now = django_timezone.now()
+    with transaction.atomic():
+        items = Item.objects.bulk_create(
+            [
+                Item(
+                    url=bookmark.url,
+                    url_hash=digest,
+                    title=(bookmark.title or bookmark.url)[:TITLE_MAX_LENGTH],
+                    description=bookmark.description,
+                    category=categories.get(
+                        (bookmark.category or default_category).strip()
+                    ),
+                    created_at=bookmark.created_at or now,
+                )
+                for bookmark, digest in new
+            ]
+        )
+
+        Through = Item.tags.through
+        links = Through.objects.bulk_create(
+            [
+                Through(item_id=item.id, tag_id=tags[name].id)
+                for item, (bookmark, _) in zip(items, new)
+                for name in {tag.strip() for tag in bookmark.tags}
+                if name in tags
+            ],
+            ignore_conflicts=True,
+        )
+        # シグナルが発行されないので、タグ・カテゴリごとの件数をまとめて増やす
+        facets.add_tag_counts(Counter(link.tag_id for link in links))
+        facets.add_category_counts(Counter(item.category_id for item in items))
+        MetadataJob.objects.enqueue_many(items)
+        search.index_items([item.id for item in items])
+    # bulk_create ではシグナルが発行されないため、サイドバーの件数をここで更新する
+    # （bulk_upsert などトランザクションの中から呼ばれた場合はコミット後に）
+    transaction.on_commit(sidebar.invalidate)
+    return items
+
+
+def import_bookmarks(
+    bookmarks, default_category="", batch_size=BATCH_SIZE, progress=None
+):
+    """ブックマークを batch_size 件ずつ登録する
+
+    正規化した URL が既に登録されているもの（ファイル内の重複を含む）と、
+    URL が不正なものはスキップする。
+    progress を渡すと、バッチごとにその時点の ImportResult を引数に呼び出す。
+    """
+    result = ImportResult()
+    bookmarks = iter(bookmarks)
+    while batch := list(islice(bookmarks, batch_size)):
+        valid = [bookmark for bookmark in batch if _valid(bookmark)]
+        result.skipped += len(batch) - len(valid)
+        batch_result = _import_batch(valid, default_category)
+        result.created += batch_result.created
+        result.skipped += batch_result.skipped
+        if progress:
+            progress(result)
+    return result
+
+
+def import_file(
+    file, format=None, default_category="", batch_size=BATCH_SIZE, progress=None
+):
+    format = format or detect_format(getattr(file, "name", ""))
+    bookmarks = PARSERS[format](open_text(file))
+    return import_bookmarks(bookmarks, default_category, batch_size, progress)
@@ -0,0 +1,122 @@
+import logging
+from datetime import timedelta
+
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .models import Item, MetadataJob
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = timedelta(minutes=1)
+BACKOFF_MAX = timedelta(hours=6)
+
+# メタデータ取得で更新されるフィールド（ユーザーの編集内容を上書きしないよう限定する）
+METADATA_FIELDS = [
+    "favicon",
+    "favicon_url",
+    "favicon_width",
+    "favicon_height",
+    "og_title",
+    "og_description",
+    "og_image",
+    "og_image_url",
+    "og_image_width",
+    "og_image_height",
+    "og_type",
+    "og_site_name",
+    "last_metadata_update",
+    "page_etag",
+    "page_last_modified",
+    "page_hash",
+    "og_image_etag",
+    "og_image_last_modified",
+    "og_image_hash",
+    "render_version",
+]
+
+
+def backoff(attempts: int) -> timedelta:
+    """試行回数に応じた再実行までの待ち時間（指数バックオフ）"""
+    return min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+def claim(job: MetadataJob) -> bool:
+    """ジョブを実行中にする。他のワーカーが先に取得していた場合は False"""
+    now = timezone.now()
+    claimed = (
+        MetadataJob.objects.due(now)
+        .filter(pk=job.pk)
+        .update(status=MetadataJob.Status.RUNNING, locked_at=now)
+    )
+    return claimed == 1
+
+
+def _save_item(item: Item, update_fields) -> bool:
+    """アイテムを保存する。取得中にアイテムが削除されていた場合は False"""
+    try:
+        with transaction.atomic():
+            item.save(update_fields=update_fields)
+    except DatabaseError:
+        # update_fields を指定した保存は対象の行がないと DatabaseError になる
+        if Item.objects.filter(pk=item.pk).exists():
+            raise
+        return False
+    return True
+
+
+def run_job(job: MetadataJob) -> None:
+    item = Item.objects.get(pk=job.item_id)
+    attempts = job.attempts + 1
+    now = timezone.now()
+    try:
+        item.fetch_metadata()
+    except Exception as e:  # noqa: BLE001
+        logger.warning("Error fetching metadata for item %s: %s", item.pk, e)
+        job.attempts = attempts
+        job.last_error = str(e)
+        job.locked_at = None
+        if attempts >= MAX_ATTEMPTS:
+            job.status = MetadataJob.Status.FAILED
+            job.finished_at = now
+            # 失敗した場合も次の更新周期までは再取得しない
+            item.last_metadata_update = now
+            if not _save_item(item, ["last_metadata_update"]):
+                # ジョブもカスケードで削除されている
+                return
+        else:
+            job.status = MetadataJob.Status.PENDING
+            job.run_at = now + backoff(attempts)
+        job.save()
+        return
+
+    item.last_metadata_update = timezone.now()
+    if not _save_item(item, METADATA_FIELDS):
+        return
+    job.attempts = attempts
+    job.status = MetadataJob.Status.DONE
+    job.last_error = ""
+    job.locked_at = None
+    job.finished_at = item.last_metadata_update
+    job.save()
+
+
+def process_jobs(limit: int = 20) -> int:
+    """実行可能なジョブを最大 limit 件処理し、処理した件数を返す"""
+    processed = 0
+    for job in MetadataJob.objects.due()[:limit]:
+        if not claim(job):
+            continue
+        try:
+            run_job(job)
+        except Exception:  # noqa: BLE001
+            if not Item.objects.filter(pk=job.item_id).exists():
+                # 実行中にアイテムが削除された（ジョブもカスケードで削除されている）
+                continue
+            # 1件のジョブの失敗でワーカーを止めない。ジョブは実行中のまま残り、
+            # ロックが切れたら再実行される
+            logger.exception("Error running metadata job %s", job.pk)
+            continue
+        processed += 1
+    return processed
@@ -0,0 +1,88 @@
+"""ブックマークのリンク切れの確認
+
+まず HEAD でステータスだけを確認し、HEAD に対応していないサーバー（405 など）のために
+エラーの場合は GET で確認し直す（本文は読まずに接続を閉じる）。
+リダイレクトは追跡し、最終的な URL と全体の応答時間を記録する。
+"""
+
+import time
+from dataclasses import dataclass
+
+import requests
+
+from config import http
+
+# 確認結果として更新するフィールド
+LINK_FIELDS = [
+    "link_status",
+    "link_final_url",
+    "link_latency_ms",
+    "link_error",
+    "link_checked_at",
+    "link_broken",
+]
+# ページ自体はあるがアクセスを制限されている（ボット対策など）ものはリンク切れにしない
+RESTRICTED_STATUSES = frozenset({401, 403, 429})
+DEFAULT_TIMEOUT = (5, 10)
+
+
+@dataclass
+class LinkResult:
+    status: int | None = None
+    final_url: str = ""
+    latency_ms: int | None = None
+    error: str = ""
+
+    @property
+    def broken(self) -> bool:
+        if self.status is None:
+            return True
+        return self.status >= 400 and self.status not in RESTRICTED_STATUSES
+
+    def apply(self, item, checked_at) -> None:
+        item.link_status = self.status
+        item.link_final_url = self.final_url if self.final_url != item.url else ""
+        item.link_latency_ms = self.latency_ms
+        item.link_error = self.error[:255]
+        item.link_checked_at = checked_at
+        item.link_broken = self.broken
+
+
+def _request(method, url, timeout):
+    response = http.request(
+        method,
+        url,
+        allow_redirects=True,
+        stream=True,
+        verify=False,
+        timeout=timeout,
+    )
+    # ステータスとリダイレクト先だけが必要なので本文は読まない
+    response.close()
+    return response
+
+
+def check_url(url: str, timeout=DEFAULT_TIMEOUT) -> LinkResult:
+    started = time.monotonic()
+    try:
+        try:
+            response = _request("HEAD", url, timeout)
+        except requests.ConnectionError:
+            # 接続できないホストは GET でも同じ
+            raise
+        except requests.RequestException:
+            response = None
+        if response is None or response.status_code >= 400:
+            response = _request("GET", url, timeout)
+    except Exception as e:  # noqa: BLE001
+        # 通信エラーのほか、解析できない URL の ValueError（LocationParseError など）も
+        # リンク切れとして記録する
+        return LinkResult(
+            latency_ms=int((time.monotonic() - started) * 1000),
+            error=f"{type(e).__name__}: {e}",
+        )
+    return LinkResult(
+        status=response.status_code,
+        final_url=response.url,
+        latency_ms=int((time.monotonic() - started) * 1000),
+    )
@@ -0,0 +1,113 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from bookmark.linkcheck import LINK_FIELDS, LinkResult, check_url
+from bookmark.models import Item, new_render_version
+from config.http import HostLimiter, interleave_by_host
+
+
+class Command(BaseCommand):
+    help = "ブックマークのリンク切れを並列に確認する"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=500, help="1回に読み込むアイテム数"
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=32, help="全体の同時リクエスト数"
+        )
+        parser.add_argument(
+            "--per-host", type=int, default=2, help="ホストごとの同時リクエスト数"
+        )
+        parser.add_argument(
+            "--timeout", type=float, default=10, help="1リクエストのタイムアウト（秒）"
+        )
+        parser.add_argument(
+            "--max-age",
+            type=int,
+            default=7,
+            help="確認してからこの日数が経ったアイテムだけを確認する（0 はすべて）",
+        )
+        parser.add_argument(
+            "--broken", action="store_true", help="リンク切れのアイテムだけを確認し直す"
+        )
+        parser.add_argument(
+            "--after-id",
+            type=int,
+            default=0,
+            help="この ID より後のアイテムから再開する（中断時に表示された ID を指定）",
+        )
+
+    def handle(self, *args, **options):
+        queryset = Item.objects.order_by("id").only(
+            "id", "url", "link_broken", "link_status", "render_version"
+        )
+        if options["broken"]:
+            queryset = queryset.filter(link_broken=True)
+        if options["max_age"]:
+            queryset = queryset.filter(
+                Q(link_checked_at__isnull=True)
+                | Q(
+                    link_checked_at__lte=timezone.now()
+                    - timedelta(days=options["max_age"])
+                )
+            )
+        total = queryset.filter(id__gt=options["after_id"]).count()
+        self.stdout.write(f"{total} 件のリンクを確認します")
+
+        limiter = HostLimiter(options["per_host"])
+        timeout = (min(5, options["timeout"]), options["timeout"])
+        last_id = options["after_id"]
+        done = broken = 0
+        started = time.monotonic()
+
+        def check(item):
+            try:
+                with limiter.limit(item.url):
+                    return item, check_url(item.url, timeout)
+            except Exception as e:  # noqa: BLE001
+                # 1件の想定外のエラーでチャンク全体の結果を失わないようにする
+                return item, LinkResult(error=f"{type(e).__name__}: {e}")
+
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            while True:
+                items = list(queryset.filter(id__gt=last_id)[: options["chunk_size"]])
+                if not items:
+                    break
+                last_id = items[-1].id
+
+                checked_at = timezone.now()
+                for item, result in executor.map(
+                    check, interleave_by_host(items, lambda item: item.url)
+                ):
+                    shown = (item.link_broken, item.link_status)
+                    result.apply(item, checked_at)
+                    if (item.link_broken, item.link_status) != shown:
+                        # 一覧に表示するリンク切れの表示が変わった
+                        item.render_version = new_render_version()
+                    if result.broken:
+                        broken += 1
+                        reason = result.status or result.error
+                        self.stderr.write(f"[{item.id}] {item.url}: {reason}")
+
+                # DB への書き込みはメインスレッドでまとめて行う
+                Item.objects.bulk_update(items, [*LINK_FIELDS, "render_version"])
+                done += len(items)
+
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{done}/{total} 件 (リンク切れ {broken}) "
+                    f"{done / elapsed:.1f} 件/秒 last_id={last_id}"
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"完了: {done} 件を確認, リンク切れ {broken} 件, "
+                f"{time.monotonic() - started:.1f} 秒"
+            )
+        )
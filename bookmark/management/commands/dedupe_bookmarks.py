@@ -0,0 +1,119 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+
+from bookmark import facets, fragments, search, sidebar
+from bookmark.models import Item
+from bookmark.urlnorm import url_hash
+
+UNIQUE_INDEX_NAME = "bookmark_item_url_hash_uniq"
+
+
+class Command(BaseCommand):
+    help = "正規化した URL が同じブックマークを最も古いものにまとめる"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500, help="1回に処理する URL の数"
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="まとめる件数を表示するだけで変更しない",
+        )
+        parser.add_argument(
+            "--create-unique-index",
+            action="store_true",
+            help="まとめた後で url_hash にユニークインデックスを作成する",
+        )
+
+    def handle(self, *args, **options):
+        filled = self.fill_missing_hashes()
+        if filled:
+            self.stdout.write(f"url_hash を {filled} 件設定しました")
+
+        duplicates = (
+            Item.objects.values("url_hash")
+            .annotate(count=Count("id"))
+            .filter(count__gt=1)
+            .values_list("url_hash", flat=True)
+            .order_by("url_hash")
+        )
+        hashes = list(duplicates)
+        self.stdout.write(f"重複している URL: {len(hashes)} 件")
+        if options["dry_run"]:
+            return
+
+        merged = 0
+        for start in range(0, len(hashes), options["batch_size"]):
+            merged += self.merge(hashes[start : start + options["batch_size"]])
+            self.stdout.write(f"{merged} 件をまとめました")
+
+        if merged:
+            # まとめた先に付け替えたタグ・カテゴリの件数を合わせる
+            facets.reconcile()
+
+        if options["create_unique_index"]:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE UNIQUE INDEX IF NOT EXISTS {UNIQUE_INDEX_NAME} "
+                    f"ON {Item._meta.db_table} (url_hash) WHERE url_hash <> ''"
+                )
+            self.stdout.write(
+                f"ユニークインデックス {UNIQUE_INDEX_NAME} を作成しました"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"完了: {merged} 件を削除しました"))
+
+    def fill_missing_hashes(self) -> int:
+        filled = 0
+        while True:
+            items = list(Item.objects.filter(url_hash="").only("id", "url")[:1000])
+            if not items:
+                return filled
+            for item in items:
+                item.url_hash = url_hash(item.url)
+            Item.objects.bulk_update(items, ["url_hash"])
+            filled += len(items)
+
+    @transaction.atomic
+    def merge(self, hashes) -> int:
+        """各 URL の最も古いアイテムに、他のアイテムのタグ・カテゴリ・説明をまとめて残りを削除する"""
+        items = (
+            Item.objects.filter(url_hash__in=hashes)
+            .order_by("url_hash", "id")
+            .prefetch_related("tags")
+        )
+        keepers = {}
+        tag_links = []
+        changed = []
+        remove = []
+        for item in items:
+            keeper = keepers.setdefault(item.url_hash, item)
+            if keeper is item:
+                continue
+            remove.append(item.id)
+            tag_links.extend(
+                Item.tags.through(item_id=keeper.id, tag_id=tag.id)
+                for tag in item.tags.all()
+            )
+            updated = False
+            if keeper.category_id is None and item.category_id is not None:
+                keeper.category_id = item.category_id
+                updated = True
+            if not keeper.description and item.description:
+                keeper.description = item.description
+                updated = True
+            if updated and keeper not in changed:
+                changed.append(keeper)
+
+        Item.tags.through.objects.bulk_create(tag_links, ignore_conflicts=True)
+        if changed:
+            Item.objects.bulk_update(changed, ["category", "description"])
+            search.index_items([item.id for item in changed])
+        # 画像ファイルの削除（参照カウント）や検索インデックスの更新のためシグナルを発行する
+        Item.objects.filter(id__in=remove).delete()
+        # まとめた先はタグなどが変わるので一覧の表示用キャッシュを無効にする
+        fragments.bump([item.id for item in keepers.values()])
+        transaction.on_commit(sidebar.invalidate)
+        return len(remove)
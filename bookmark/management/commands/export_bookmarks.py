@@ -0,0 +1,28 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from bookmark.exporter import CHUNK_SIZE, FORMATS, export
+
+
+class Command(BaseCommand):
+    help = "ブックマークを JSON Lines / CSV / Netscape 形式の HTML で書き出す"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format", choices=list(FORMATS), default="jsonl", help="出力形式"
+        )
+        parser.add_argument(
+            "-o", "--output", help="出力先のファイル（省略時は標準出力）"
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=CHUNK_SIZE, help="1回に読み込む件数"
+        )
+
+    def handle(self, *args, **options):
+        chunks = export(options["format"], chunk_size=options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as file:
+                file.writelines(chunks)
+        else:
+            sys.stdout.writelines(chunks)
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from bookmark.models import Item, new_render_version
+from bookmark.thumbnails import generate_variants, image_size
+
+
+class Command(BaseCommand):
+    help = "既存の OGP画像・ファビコンの縮小版を生成し、画像の大きさを記録する"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=500, help="1回に読み込むアイテム数"
+        )
+        parser.add_argument(
+            "--all", action="store_true", help="生成済みのアイテムも含めて処理する"
+        )
+
+    def handle(self, *args, **options):
+        queryset = Item.objects.exclude(
+            (Q(og_image="") | Q(og_image__isnull=True))
+            & (Q(favicon="") | Q(favicon__isnull=True))
+        ).only("id", "og_image", "favicon")
+        if not options["all"]:
+            queryset = queryset.filter(
+                (Q(og_image_width__isnull=True) & ~Q(og_image=""))
+                | (Q(favicon_width__isnull=True) & ~Q(favicon=""))
+            )
+
+        # 同じファイルを共有するアイテムが多いので、1ファイル1回だけ処理する
+        sizes = {}
+        last_id = 0
+        updated = 0
+        while True:
+            items = list(
+                queryset.filter(id__gt=last_id).order_by("id")[: options["chunk_size"]]
+            )
+            if not items:
+                break
+            last_id = items[-1].id
+
+            for item in items:
+                # 画像の width / height 属性が変わるので一覧の表示用キャッシュも無効にする
+                item.render_version = new_render_version()
+                for field_name in ("og_image", "favicon"):
+                    file = getattr(item, field_name)
+                    if not file:
+                        continue
+                    if file.name not in sizes:
+                        generate_variants(file.storage, file.name)
+                        sizes[file.name] = image_size(file.storage, file.name)
+                    width, height = sizes[file.name]
+                    setattr(item, f"{field_name}_width", width)
+                    setattr(item, f"{field_name}_height", height)
+
+            Item.objects.bulk_update(
+                items,
+                [
+                    "og_image_width",
+                    "og_image_height",
+                    "favicon_width",
+                    "favicon_height",
+                    "render_version",
+                ],
+            )
+            updated += len(items)
+            self.stdout.write(f"{updated} 件処理しました (last_id={last_id})")
+
+        self.stdout.write(self.style.SUCCESS(f"完了: {updated} 件"))
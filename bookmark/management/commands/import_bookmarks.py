@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookmark.importer import BATCH_SIZE, FORMATS, import_file
+
+
+class Command(BaseCommand):
+    help = "ブラウザのブックマークのエクスポートファイル（HTML / JSON / JSON Lines）をインポートする"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="インポートするファイル")
+        parser.add_argument(
+            "--format", choices=FORMATS, help="ファイル形式（省略時は拡張子から判定）"
+        )
+        parser.add_argument(
+            "--category",
+            default="",
+            help="フォルダに入っていないブックマークのカテゴリ",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=BATCH_SIZE, help="1回に登録する件数"
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def progress(result):
+            self.stdout.write(
+                f"登録 {result.created} 件, スキップ {result.skipped} 件 "
+                f"({time.monotonic() - started:.1f} 秒)"
+            )
+
+        with open(options["path"], "rb") as file:
+            result = import_file(
+                file,
+                format=options["format"],
+                default_category=options["category"],
+                batch_size=options["batch_size"],
+                progress=progress,
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"完了: 登録 {result.created} 件, スキップ {result.skipped} 件 "
+                f"({time.monotonic() - started:.1f} 秒)"
+            )
+        )
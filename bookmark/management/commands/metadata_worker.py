@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookmark.jobs import process_jobs
+
+
+class Command(BaseCommand):
+    help = "メタデータ取得ジョブを処理するワーカー"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true", help="実行可能なジョブを処理したら終了する"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=20, help="1回に取得するジョブ数"
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=5.0, help="ジョブがない場合の待機秒数"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                processed = process_jobs(limit=options["batch_size"])
+                if processed:
+                    self.stdout.write(f"{processed} 件のジョブを処理しました")
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+        except KeyboardInterrupt:
+            self.stdout.write("ワーカーを停止しました")
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from bookmark import search
+
+
+class Command(BaseCommand):
+    help = "ブックマークの全文検索インデックスを作り直す"
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write("このデータベースでは全文検索インデックスを使用しません")
+            return
+        started = time.monotonic()
+        with transaction.atomic():
+            search.install()
+            count = search.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"完了: {count} 件 ({time.monotonic() - started:.1f} 秒)"
+            )
+        )
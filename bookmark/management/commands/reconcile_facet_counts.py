@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from bookmark import facets, sidebar
+
+
+class Command(BaseCommand):
+    help = "タグ・カテゴリごとのアイテム数を実際の件数に合わせる（定期実行用）"
+
+    def handle(self, *args, **options):
+        fixed = facets.reconcile()
+        if fixed["tags"] or fixed["categories"]:
+            sidebar.invalidate()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"完了: タグ {fixed['tags']} 件, カテゴリ {fixed['categories']} 件を補正しました"
+            )
+        )
@@ -0,0 +1,122 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from bookmark import search
+from bookmark.jobs import METADATA_FIELDS
+from bookmark.models import (
+    METADATA_REFRESH_INTERVAL,
+    Item,
+    MetadataJob,
+    new_render_version,
+)
+from bookmark.storage import content_store
+from config.http import HostLimiter, interleave_by_host
+
+IMAGE_FIELDS = ("favicon", "og_image")
+
+
+class Command(BaseCommand):
+    help = "古くなったブックマークのメタデータを並列に再取得する"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=200, help="1回に読み込むアイテム数"
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=16, help="全体の同時リクエスト数"
+        )
+        parser.add_argument(
+            "--per-host", type=int, default=2, help="ホストごとの同時リクエスト数"
+        )
+        parser.add_argument(
+            "--after-id",
+            type=int,
+            default=0,
+            help="この ID より後のアイテムから再開する（中断時に表示された ID を指定）",
+        )
+        parser.add_argument(
+            "--all", action="store_true", help="古くないアイテムも含めて再取得する"
+        )
+
+    def handle(self, *args, **options):
+        queryset = Item.objects.order_by("id")
+        if not options["all"]:
+            queryset = queryset.filter(
+                Q(last_metadata_update__isnull=True)
+                | Q(
+                    last_metadata_update__lte=timezone.now() - METADATA_REFRESH_INTERVAL
+                )
+            )
+        total = queryset.filter(id__gt=options["after_id"]).count()
+        self.stdout.write(f"{total} 件のアイテムを再取得します")
+
+        limiter = HostLimiter(options["per_host"])
+        last_id = options["after_id"]
+        done = failed = 0
+        started = time.monotonic()
+
+        def refresh(item):
+            try:
+                with limiter.limit(item.url):
+                    item.fetch_metadata()
+                item.last_metadata_update = timezone.now()
+                item.render_version = new_render_version()
+                return item, None
+            except Exception as e:  # noqa: BLE001
+                return item, e
+            finally:
+                # ワーカースレッドで開いた DB 接続（ファビコンキャッシュ用）を閉じる
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            while True:
+                items = list(queryset.filter(id__gt=last_id)[: options["chunk_size"]])
+                if not items:
+                    break
+                last_id = items[-1].id
+                # 置き換わった画像を削除するため、取得前のファイル名を覚えておく
+                old_images = {
+                    item.id: {name: getattr(item, name).name for name in IMAGE_FIELDS}
+                    for item in items
+                }
+
+                refreshed = []
+                for item, error in executor.map(
+                    refresh, interleave_by_host(items, lambda item: item.url)
+                ):
+                    if error is None:
+                        refreshed.append(item)
+                    else:
+                        failed += 1
+                        self.stderr.write(f"[{item.id}] {item.url}: {error}")
+
+                Item.objects.bulk_update(refreshed, METADATA_FIELDS)
+                # bulk_update では post_save が送られず django_cleanup が古い画像を
+                # 削除しないので、ここで削除する（他のアイテムが使っていれば残る）
+                for item in refreshed:
+                    for name, old in old_images[item.id].items():
+                        if old and old != getattr(item, name).name:
+                            content_store.delete(old)
+                search.index_items([item.id for item in refreshed])
+                MetadataJob.objects.filter(
+                    item__in=refreshed, status=MetadataJob.Status.PENDING
+                ).update(status=MetadataJob.Status.DONE, finished_at=timezone.now())
+                done += len(refreshed)
+
+                elapsed = time.monotonic() - started
+                processed = done + failed
+                self.stdout.write(
+                    f"{processed}/{total} 件 (成功 {done}, 失敗 {failed}) "
+                    f"{processed / elapsed:.1f} 件/秒 last_id={last_id}"
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"完了: 成功 {done} 件, 失敗 {failed} 件, {time.monotonic() - started:.1f} 秒"
+            )
+        )
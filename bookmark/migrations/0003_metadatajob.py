@@ -0,0 +1,38 @@
+# Generated by Django 4.2.16 on 2026-10-18 05:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookmark', '0002_alter_item_favicon_alter_item_og_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetadataJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', '待機中'), ('running', '実行中'), ('done', '完了'), ('failed', '失敗')], default='pending', max_length=20, verbose_name='ステータス')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='試行回数')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='実行予定日時')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='ロック日時')),
+                ('last_error', models.TextField(blank=True, verbose_name='エラー')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='登録日時')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完了日時')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metadata_jobs', to='bookmark.item', verbose_name='アイテム')),
+            ],
+            options={
+                'verbose_name_plural': 'メタデータ取得ジョブ',
+                'ordering': ('run_at', 'id'),
+                'indexes': [models.Index(fields=['status', 'run_at'], name='bookmark_me_status_fde315_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='metadatajob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('item',), name='bookmark_metadatajob_unique_active_item'),
+        ),
+    ]
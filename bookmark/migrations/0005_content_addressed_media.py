@@ -0,0 +1,53 @@
+# Generated by Django 4.2.16 on 2026-10-18 05:58
+
+import bookmark.models
+import bookmark.storage
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookmark', '0004_item_metadata_validators'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DomainFavicon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('domain', models.CharField(max_length=255, unique=True, verbose_name='ドメイン')),
+                ('favicon', models.ImageField(blank=True, max_length=255, null=True, storage=bookmark.storage.get_content_store, upload_to=bookmark.models.upload_to_favicon)),
+                ('source_url', models.URLField(blank=True, max_length=2000)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('last_modified', models.CharField(blank=True, max_length=64)),
+                ('checked_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='確認日時')),
+            ],
+            options={
+                'verbose_name_plural': 'ファビコンキャッシュ',
+            },
+        ),
+        migrations.RemoveField(
+            model_name='item',
+            name='favicon_etag',
+        ),
+        migrations.RemoveField(
+            model_name='item',
+            name='favicon_hash',
+        ),
+        migrations.RemoveField(
+            model_name='item',
+            name='favicon_last_modified',
+        ),
+        migrations.AlterField(
+            model_name='item',
+            name='favicon',
+            field=models.ImageField(blank=True, db_index=True, max_length=255, null=True, storage=bookmark.storage.get_content_store, upload_to=bookmark.models.upload_to_favicon),
+        ),
+        migrations.AlterField(
+            model_name='item',
+            name='og_image',
+            field=models.ImageField(blank=True, db_index=True, max_length=255, null=True, storage=bookmark.storage.get_content_store, upload_to=bookmark.models.upload_to_og_image),
+        ),
+    ]
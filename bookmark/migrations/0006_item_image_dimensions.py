@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookmark', '0005_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='favicon_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='favicon_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='og_image_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='og_image_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
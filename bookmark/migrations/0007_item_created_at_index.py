@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookmark', '0006_item_image_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['created_at', 'id'], name='bookmark_it_created_ad04b8_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:40
+
+from django.db import migrations
+
+# bookmark.search と同じ定義をこの時点のものとして固定する
+# （モジュールを変更しても、このマイグレーションの結果が変わらないようにする）
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS bookmark_item_fts "
+    "USING fts5(title, og_title, description, og_description, url, tokenize='trigram')",
+    "INSERT INTO bookmark_item_fts (rowid, title, og_title, description, og_description, url) "
+    "SELECT id, title, og_title, description, og_description, url FROM bookmark_item",
+    "INSERT INTO bookmark_item_fts (bookmark_item_fts) VALUES ('optimize')",
+]
+SQLITE_DROP = ["DROP TABLE IF EXISTS bookmark_item_fts"]
+
+POSTGRES_CREATE = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE TABLE IF NOT EXISTS bookmark_item_search ("
+    "item_id bigint PRIMARY KEY REFERENCES bookmark_item (id) ON DELETE CASCADE,"
+    " document text NOT NULL,"
+    " vector tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS bookmark_item_search_document_trgm "
+    "ON bookmark_item_search USING gin (document gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS bookmark_item_search_vector "
+    "ON bookmark_item_search USING gin (vector)",
+    "INSERT INTO bookmark_item_search (item_id, document, vector) "
+    "SELECT id, lower(concat_ws(' ', title, og_title, description, og_description, url)),"
+    " setweight(to_tsvector('simple', title || ' ' || og_title), 'A')"
+    " || setweight(to_tsvector('simple', description || ' ' || og_description), 'B')"
+    " || setweight(to_tsvector('simple', url), 'D') "
+    "FROM bookmark_item "
+    "ON CONFLICT (item_id) DO UPDATE"
+    " SET document = EXCLUDED.document, vector = EXCLUDED.vector",
+    "ANALYZE bookmark_item_search",
+]
+POSTGRES_DROP = ["DROP TABLE IF EXISTS bookmark_item_search"]
+
+
+def _execute(schema_editor, statements):
+    with schema_editor.connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_CREATE)
+    elif vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_CREATE)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_DROP)
+    elif vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookmark', '0007_item_created_at_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
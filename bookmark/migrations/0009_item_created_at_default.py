@@ -0,0 +1,19 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:13
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookmark', '0008_item_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='item',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='登録日時'),
+        ),
+    ]
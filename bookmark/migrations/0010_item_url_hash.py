@@ -0,0 +1,83 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:20
+
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.db import migrations, models
+
+# bookmark.urlnorm の正規化をこの時点のものとして固定する
+# （正規化を変更しても、このマイグレーションの結果が変わらないようにする）
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+TRACKING_PARAM_PREFIXES = ('utm_',)
+TRACKING_PARAMS = {'fbclid', 'gclid', 'yclid', 'msclkid', 'mc_cid', 'mc_eid', 'igshid'}
+
+
+def normalize_url(url):
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    netloc = host if port in (None, DEFAULT_PORTS.get(scheme)) else f'{host}:{port}'
+    if parts.username:
+        userinfo = parts.username
+        if parts.password:
+            userinfo += f':{parts.password}'
+        netloc = f'{userinfo}@{netloc}'
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+
+def canonicalize_url(url):
+    try:
+        parts = urlsplit(normalize_url(url))
+    except ValueError:
+        return url.strip()
+    scheme = 'https' if parts.scheme == 'http' else parts.scheme
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(
+        sorted(
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if key not in TRACKING_PARAMS
+            and not key.startswith(TRACKING_PARAM_PREFIXES)
+        )
+    )
+    return urlunsplit((scheme, parts.netloc, path, query, ''))
+
+
+def url_hash(url):
+    return hashlib.sha256(canonicalize_url(url).encode()).hexdigest()
+
+
+def fill_url_hash(apps, schema_editor):
+    Item = apps.get_model('bookmark', 'Item')
+    last_id = 0
+    while True:
+        items = list(
+            Item.objects.filter(id__gt=last_id).order_by('id').only('id', 'url')[:1000]
+        )
+        if not items:
+            break
+        last_id = items[-1].id
+        for item in items:
+            item.url_hash = url_hash(item.url)
+        Item.objects.bulk_update(items, ['url_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookmark', '0009_item_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='url_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(fill_url_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:21
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counts(apps, schema_editor):
+    Item = apps.get_model('bookmark', 'Item')
+    Category = apps.get_model('bookmark', 'Category')
+    Tag = apps.get_model('bookmark', 'Tag')
+    Through = Item.tags.through
+
+    tag_counts = (
+        Through.objects.filter(tag_id=OuterRef('pk'))
+        .values('tag_id')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    Tag.objects.update(item_count=Coalesce(Subquery(tag_counts), 0))
+    category_counts = (
+        Item.objects.filter(category_id=OuterRef('pk'))
+        .values('category_id')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    Category.objects.update(item_count=Coalesce(Subquery(category_counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookmark', '0010_item_url_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='item_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='アイテム数'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='item_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='アイテム数'),
+        ),
+        migrations.RunPython(fill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bookmark", "0011_facet_counts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="item",
+            name="link_broken",
+            field=models.BooleanField(default=False, verbose_name="リンク切れ"),
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="link_checked_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="リンク確認日時"
+            ),
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="link_error",
+            field=models.CharField(blank=True, max_length=255, verbose_name="エラー"),
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="link_final_url",
+            field=models.URLField(
+                blank=True, max_length=2000, verbose_name="リダイレクト先"
+            ),
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="link_latency_ms",
+            field=models.PositiveIntegerField(
+                blank=True, null=True, verbose_name="応答時間(ms)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="link_status",
+            field=models.PositiveSmallIntegerField(
+                blank=True, null=True, verbose_name="ステータス"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                condition=models.Q(("link_broken", True)),
+                fields=["id"],
+                name="bookmark_item_broken_idx",
+            ),
+        ),
+    ]
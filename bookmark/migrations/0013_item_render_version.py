@@ -0,0 +1,20 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:27
+
+import bookmark.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bookmark", "0012_item_link_health"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="item",
+            name="render_version",
+            field=models.PositiveIntegerField(
+                default=bookmark.models.new_render_version, editable=False
+            ),
+        ),
+    ]
@@ -1,18 +1,45 @@
+import hashlib
+import logging
 import os
-from urllib.parse import urljoin
+import random
+from datetime import timedelta
+from urllib.parse import urljoin, urlsplit
 from uuid import uuid4
 
-import requests
-from bs4 import BeautifulSoup
 from django.core.files.base import ContentFile
 from django.db import models
 from django.utils import timezone
 
+from config import http
+
+from .extractor import extract_metadata
+from .storage import get_content_store
+from .thumbnails import image_size
+from .urlnorm import url_hash
+
 # urllib3.disable_warnings(InsecureRequestWarning)
 
+logger = logging.getLogger(__name__)
+
+# メタデータを再取得するまでの間隔
+METADATA_REFRESH_INTERVAL = timedelta(days=7)
+
+
+def new_render_version() -> int:
+    """一覧の HTML 断片のキャッシュキーに使うバージョン（bookmark/fragments.py）
+
+    連番ではなく乱数にしているので、古い値のままのインスタンスを保存しても
+    以前のキャッシュと同じキーにはならない。
+    """
+    return random.getrandbits(31)
+
 
 class Category(models.Model):
     name = models.CharField("カテゴリ", max_length=200, unique=True)
+    # このカテゴリのアイテム数（signals で増減し、reconcile_facet_counts で補正する）
+    item_count = models.PositiveIntegerField(
+        "アイテム数", default=0, editable=False, db_index=True
+    )
 
     class Meta:
         verbose_name_plural = "カテゴリ"
@@ -23,6 +50,10 @@ class Category(models.Model):
 
 class Tag(models.Model):
     name = models.CharField("タグ", max_length=200, unique=True)
+    # このタグが付いたアイテム数（signals で増減し、reconcile_facet_counts で補正する）
+    item_count = models.PositiveIntegerField(
+        "アイテム数", default=0, editable=False, db_index=True
+    )
 
     class Meta:
         verbose_name_plural = "タグ"
@@ -31,6 +62,7 @@ class Tag(models.Model):
         return self.name
 
 
+# ファイル名は保存時に ContentAddressedStorage が内容のハッシュに置き換える
 def upload_to_favicon(instance, filename):
     _, ext = os.path.splitext(filename)
     ext = ext.lower()
@@ -45,8 +77,76 @@ def upload_to_og_image(instance, filename):
     return f"media/images/bookmark/og_images/{filename}"
 
 
+class DomainFavicon(models.Model):
+    """ドメインごとのファビコンのキャッシュ
+
+    同じサイトのブックマークはここに保存したファイルを共有し、
+    キャッシュが新しい間はファビコンを取得しに行かない。
+    """
+
+    # この期間を過ぎたら条件付きリクエストで再検証する
+    TTL = timedelta(days=30)
+
+    domain = models.CharField("ドメイン", max_length=255, unique=True)
+    favicon = models.ImageField(
+        upload_to=upload_to_favicon,
+        storage=get_content_store,
+        max_length=255,
+        blank=True,
+        null=True,
+    )
+    source_url = models.URLField(max_length=2000, blank=True)
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    checked_at = models.DateTimeField("確認日時", default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = "ファビコンキャッシュ"
+
+    def __str__(self) -> str:
+        return self.domain
+
+    def is_fresh(self) -> bool:
+        return timezone.now() - self.checked_at < self.TTL
+
+
+class ItemQuerySet(models.QuerySet):
+    # 一覧テンプレート（components/card.html, list.html）で使うカラム
+    LISTING_FIELDS = (
+        "id",
+        "url",
+        "title",
+        "description",
+        "og_description",
+        "created_at",
+        "favicon",
+        "favicon_width",
+        "favicon_height",
+        "og_image",
+        "og_image_width",
+        "og_image_height",
+        "category",
+        "category__name",
+        "link_broken",
+        "link_status",
+        "render_version",
+    )
+
+    def for_listing(self):
+        """一覧表示用。タグはキャッシュにない行を描画するときに fragments.render_items が先読みする"""
+        return self.select_related("category").only(*self.LISTING_FIELDS)
+
+    def find_duplicate(self, url):
+        """正規化した URL が同じアイテム（最も古いもの）。なければ None"""
+        return self.filter(url_hash=url_hash(url)).order_by("id").first()
+
+
 class Item(models.Model):
     url = models.URLField(max_length=2000)
+    # 正規化した URL の SHA-256（重複の検索用）
+    url_hash = models.CharField(
+        max_length=64, blank=True, editable=False, db_index=True
+    )
     title = models.CharField(verbose_name="タイトル", max_length=512)
     description = models.TextField(blank=True)
     category = models.ForeignKey(
@@ -59,85 +159,327 @@ class Item(models.Model):
     tags = models.ManyToManyField(
         Tag, verbose_name="タグ", related_name="tags", blank=True
     )
-    created_at = models.DateTimeField("登録日時", auto_now_add=True)
+    # インポート時に元の登録日時を指定できるよう auto_now_add ではなく default を使う
+    created_at = models.DateTimeField("登録日時", default=timezone.now, editable=False)
 
     # ファビコン関連
-    favicon = models.ImageField(upload_to=upload_to_favicon, blank=True, null=True)
+    favicon = models.ImageField(
+        upload_to=upload_to_favicon,
+        storage=get_content_store,
+        max_length=255,
+        blank=True,
+        null=True,
+        db_index=True,
+    )
     favicon_url = models.URLField(max_length=255, blank=True)
+    favicon_width = models.PositiveIntegerField(null=True, blank=True)
+    favicon_height = models.PositiveIntegerField(null=True, blank=True)
 
     # OGP関連
     og_title = models.CharField(max_length=512, blank=True)
     og_description = models.TextField(blank=True)
-    og_image = models.ImageField(upload_to=upload_to_og_image, blank=True, null=True)
+    og_image = models.ImageField(
+        upload_to=upload_to_og_image,
+        storage=get_content_store,
+        max_length=255,
+        blank=True,
+        null=True,
+        db_index=True,
+    )
+    og_image_url = models.URLField(max_length=2000, blank=True)
+    # 画像の大きさ（縮小版の srcset と width/height 属性に使う。読めない画像は空）
+    og_image_width = models.PositiveIntegerField(null=True, blank=True)
+    og_image_height = models.PositiveIntegerField(null=True, blank=True)
     og_type = models.CharField(max_length=50, blank=True)
     og_site_name = models.CharField(max_length=512, blank=True)
 
     last_metadata_update = models.DateTimeField(null=True, blank=True)
 
+    objects = ItemQuerySet.as_manager()
+
+    # 再取得時の条件付きリクエスト用（ETag / Last-Modified / 本文の SHA-256）
+    # ファビコンのバリデータは DomainFavicon が持つ
+    page_etag = models.CharField(max_length=255, blank=True)
+    page_last_modified = models.CharField(max_length=64, blank=True)
+    page_hash = models.CharField(max_length=64, blank=True)
+    og_image_etag = models.CharField(max_length=255, blank=True)
+    og_image_last_modified = models.CharField(max_length=64, blank=True)
+    og_image_hash = models.CharField(max_length=64, blank=True)
+
+    # リンク切れの確認結果（check_links コマンドが更新する）
+    link_status = models.PositiveSmallIntegerField("ステータス", null=True, blank=True)
+    link_final_url = models.URLField("リダイレクト先", max_length=2000, blank=True)
+    link_latency_ms = models.PositiveIntegerField("応答時間(ms)", null=True, blank=True)
+    link_error = models.CharField("エラー", max_length=255, blank=True)
+    link_checked_at = models.DateTimeField("リンク確認日時", null=True, blank=True)
+    link_broken = models.BooleanField("リンク切れ", default=False)
+
+    # 表示に関わる変更のたびに新しい値にする（一覧の HTML 断片のキャッシュキー）
+    render_version = models.PositiveIntegerField(
+        default=new_render_version, editable=False
+    )
+
     class Meta:
         verbose_name_plural = "アイテム"
         ordering = ("-id",)
+        indexes = [
+            models.Index(fields=["created_at", "id"]),
+            # リンク切れの一覧用（該当するアイテムは少ないので部分インデックスにする）
+            models.Index(
+                fields=["id"],
+                condition=models.Q(link_broken=True),
+                name="bookmark_item_broken_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_url = instance.__dict__.get("url")
+        # カテゴリごとの件数の更新で、変更前のカテゴリを知るために使う
+        instance._loaded_category_id = instance.__dict__.get(
+            "category_id", models.DEFERRED
+        )
+        return instance
+
     def save(self, *args, **kwargs):
-        if (
-            not self.last_metadata_update
-            or (timezone.now() - self.last_metadata_update).days >= 7
-        ):
-            self.fetch_metadata()
-            self.last_metadata_update = timezone.now()
+        loaded_url = getattr(self, "_loaded_url", None)
+        if loaded_url is not None and loaded_url != self.url:
+            # URL が変わった場合は旧 URL のバリデータを捨てて取り直す
+            self.page_etag = self.page_last_modified = self.page_hash = ""
+            self.last_metadata_update = None
+            # リンクの確認結果も旧 URL のものなので捨てる
+            self.link_status = self.link_latency_ms = self.link_checked_at = None
+            self.link_final_url = self.link_error = ""
+            self.link_broken = False
+        if loaded_url != self.url or not self.url_hash:
+            self.url_hash = url_hash(self.url)
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and "url" in update_fields:
+                kwargs["update_fields"] = {*update_fields, "url_hash"}
+        self.render_version = new_render_version()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "render_version"}
         super().save(*args, **kwargs)
+        self._loaded_url = self.url
+        # メタデータの取得はリクエスト内では行わず、ワーカーに任せる
+        if self.metadata_is_stale():
+            MetadataJob.objects.enqueue(self)
+
+    def metadata_is_stale(self) -> bool:
+        return (
+            not self.last_metadata_update
+            or timezone.now() - self.last_metadata_update >= METADATA_REFRESH_INTERVAL
+        )
 
     def fetch_metadata(self):
-        try:
-            response = requests.get(self.url, verify=False)
-            soup = BeautifulSoup(response.text, "html.parser")
+        """ページ・ファビコン・OGP画像を取得してフィールドに設定する（保存はしない）
+
+        前回のバリデータで条件付きリクエストを送り、304 または本文のハッシュが
+        同じ場合は解析・画像の保存を省略する。
+        通信エラーは呼び出し元（メタデータジョブ）でリトライできるよう送出する。
+        """
+        response = http.get(
+            self.url,
+            stream=True,
+            verify=False,
+            headers=http.conditional_headers(self.page_etag, self.page_last_modified),
+        )
+        if response.status_code == 304:
+            response.close()
+        else:
+            response.raise_for_status()
+            self.page_etag = response.headers.get("ETag", "")
+            self.page_last_modified = response.headers.get("Last-Modified", "")
+            # <head> までしか読まないので、ハッシュも <head> までの内容で比較する
+            page = extract_metadata(response, base_url=self.url)
+            if page.digest != self.page_hash:
+                self.page_hash = page.digest
+                self._apply_page_metadata(page)
+
+        # ページが変わっていなくても画像は個別に再検証する
+        if self.favicon_url:
+            self._fetch_favicon()
+        if self.og_image_url:
+            self._fetch_og_image()
+
+    def _apply_page_metadata(self, page):
+        if page.favicon_url:
+            self.favicon_url = page.favicon_url
+
+        # OGP情報
+        og = page.og
+        if og.get("title"):
+            self.og_title = og["title"]
+        if og.get("description"):
+            self.og_description = og["description"]
+        if og.get("image"):
+            self._set_image_url("og_image", urljoin(self.url, og["image"]))
+        if og.get("type"):
+            self.og_type = og["type"]
+        if og.get("site_name"):
+            self.og_site_name = og["site_name"]
+
+    def _set_image_url(self, field_name, url):
+        if getattr(self, f"{field_name}_url") == url:
+            return
+        setattr(self, f"{field_name}_url", url)
+        # 別の画像になったので旧 URL のバリデータは使えない
+        setattr(self, f"{field_name}_etag", "")
+        setattr(self, f"{field_name}_last_modified", "")
+
+    def _fetch_favicon(self):
+        """ドメインのファビコンキャッシュを使い、必要な場合だけ取得する"""
+        domain = urlsplit(self.url).hostname or ""
+        cached = DomainFavicon.objects.filter(domain=domain).first()
+        same_source = cached is not None and cached.source_url == self.favicon_url
+        if same_source and cached.favicon and cached.is_fresh():
+            self._set_favicon_name(cached.favicon.name)
+            return
+
+        headers = (
+            http.conditional_headers(cached.etag, cached.last_modified)
+            if same_source and cached.favicon
+            else {}
+        )
+        response = http.fetch(self.favicon_url, verify=False, headers=headers)
+        if response.status_code == 304:
+            cached.checked_at = timezone.now()
+            cached.save(update_fields=["checked_at"])
+            self._set_favicon_name(cached.favicon.name)
+            return
+        if response.status_code != 200:
+            return
+
+        # 内容が同じなら ContentAddressedStorage は同じ名前を返し、書き込みもしない
+        self.favicon.save(
+            self.favicon_url.split("/")[-1], ContentFile(response.content), save=False
+        )
+        self.favicon_width, self.favicon_height = image_size(
+            self.favicon.storage, self.favicon.name
+        )
+        DomainFavicon.objects.update_or_create(
+            domain=domain,
+            defaults={
+                "favicon": self.favicon.name,
+                "source_url": self.favicon_url,
+                "etag": response.headers.get("ETag", ""),
+                "last_modified": response.headers.get("Last-Modified", ""),
+                "checked_at": timezone.now(),
+            },
+        )
+
+    def _fetch_og_image(self):
+        """OGP画像を条件付きで取得し、内容が変わった場合だけファイルを保存する"""
+        # 保存済みのファイルがない場合はバリデータを使わずに取り直す
+        headers = (
+            http.conditional_headers(self.og_image_etag, self.og_image_last_modified)
+            if self.og_image
+            else {}
+        )
+        response = http.fetch(self.og_image_url, verify=False, headers=headers)
+        if response.status_code != 200:
+            return
+
+        self.og_image_etag = response.headers.get("ETag", "")
+        self.og_image_last_modified = response.headers.get("Last-Modified", "")
+        digest = hashlib.sha256(response.content).hexdigest()
+        if self.og_image and digest == self.og_image_hash:
+            return
+        self.set_og_image(self.og_image_url, response.content, digest)
+
+    def _set_favicon_name(self, name):
+        if self.favicon.name == name and self.favicon_width:
+            return
+        self.favicon.name = name
+        self.favicon_width, self.favicon_height = image_size(self.favicon.storage, name)
+
+    def set_og_image(self, url, content, digest=None):
+        """OGP画像を保存する（縮小版はストレージが生成する）。モデルの保存はしない"""
+        name = url.split("/")[-1].split("?")[0]
+        if not name or "." not in name:
+            name = "og_image.jpg"
+        self.og_image.save(name, ContentFile(content), save=False)
+        self.og_image_url = url
+        self.og_image_hash = digest or hashlib.sha256(content).hexdigest()
+        self.og_image_width, self.og_image_height = image_size(
+            self.og_image.storage, self.og_image.name
+        )
 
-            # ファビコンの取得と保存
-            favicon = soup.find("link", rel="icon") or soup.find(
-                "link", rel="shortcut icon"
+
+class MetadataJobManager(models.Manager):
+    def enqueue(self, item, run_at=None):
+        """アイテムのメタデータ取得ジョブを登録する
+
+        同じアイテムの未完了ジョブが既にある場合は何もしない（部分ユニーク制約で重複を防ぐ）。
+        """
+        self.enqueue_many([item], run_at)
+
+    def enqueue_many(self, items, run_at=None, batch_size=1000):
+        run_at = run_at or timezone.now()
+        self.bulk_create(
+            [self.model(item=item, run_at=run_at) for item in items],
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+
+    def due(self, now=None):
+        """実行可能なジョブ（期限が来た待機中ジョブと、ロックが切れた実行中ジョブ）"""
+        now = now or timezone.now()
+        return self.filter(
+            models.Q(status=MetadataJob.Status.PENDING, run_at__lte=now)
+            | models.Q(
+                status=MetadataJob.Status.RUNNING,
+                locked_at__lt=now - MetadataJob.LOCK_TIMEOUT,
+            )
+        )
+
+
+class MetadataJob(models.Model):
+    """Item のメタデータ取得を行うバックグラウンドジョブ（DB をキューとして使う）"""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "待機中"
+        RUNNING = "running", "実行中"
+        DONE = "done", "完了"
+        FAILED = "failed", "失敗"
+
+    # 実行中のままこの時間を過ぎたジョブはワーカーが落ちたとみなして再実行する
+    LOCK_TIMEOUT = timedelta(minutes=10)
+
+    item = models.ForeignKey(
+        Item,
+        verbose_name="アイテム",
+        on_delete=models.CASCADE,
+        related_name="metadata_jobs",
+    )
+    status = models.CharField(
+        "ステータス", max_length=20, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField("試行回数", default=0)
+    run_at = models.DateTimeField("実行予定日時", default=timezone.now)
+    locked_at = models.DateTimeField("ロック日時", null=True, blank=True)
+    last_error = models.TextField("エラー", blank=True)
+    created_at = models.DateTimeField("登録日時", auto_now_add=True)
+    finished_at = models.DateTimeField("完了日時", null=True, blank=True)
+
+    objects = MetadataJobManager()
+
+    class Meta:
+        verbose_name_plural = "メタデータ取得ジョブ"
+        ordering = ("run_at", "id")
+        indexes = [models.Index(fields=["status", "run_at"])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["item"],
+                condition=models.Q(status__in=["pending", "running"]),
+                name="bookmark_metadatajob_unique_active_item",
             )
-            print(favicon)
-            if favicon:
-                favicon_url = urljoin(self.url, favicon["href"])
-                favicon_response = requests.get(favicon_url)
-                if favicon_response.status_code == 200:
-                    favicon_name = favicon_url.split("/")[-1]
-                    self.favicon.save(
-                        favicon_name, ContentFile(favicon_response.content), save=False
-                    )
-
-            # OGP情報の取得
-            og_title = soup.find("meta", property="og:title")
-            if og_title:
-                self.og_title = og_title["content"]
-
-            og_description = soup.find("meta", property="og:description")
-            if og_description:
-                self.og_description = og_description["content"]
-
-            og_image = soup.find("meta", property="og:image")
-            print(og_image)
-            if og_image:
-                og_image_url = urljoin(self.url, og_image["content"])
-                og_image_response = requests.get(og_image_url)
-                if og_image_response.status_code == 200:
-                    og_image_name = og_image_url.split("/")[-1]
-                    self.og_image.save(
-                        og_image_name,
-                        ContentFile(og_image_response.content),
-                        save=False,
-                    )
-
-            og_type = soup.find("meta", property="og:type")
-            if og_type:
-                self.og_type = og_type["content"]
-
-            og_site_name = soup.find("meta", property="og:site_name")
-            if og_site_name:
-                self.og_site_name = og_site_name["content"]
-
-        except Exception as e:
-            print(f"Error fetching metadata: {e}")
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.item_id} ({self.status})"
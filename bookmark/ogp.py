@@ -0,0 +1,94 @@
+"""クイック追加画面の OGP 取得結果のキャッシュ
+
+結果は Django のキャッシュ（全ワーカーで共有）に正規化した URL をキーにして保存する。
+取得に失敗した URL も短い期間キャッシュし、同じ URL の取得が同時に来た場合は
+ロックを取れた1つだけが取得して、残りはその結果を待つ。
+"""
+
+import hashlib
+import logging
+import time
+
+from django.core.cache import cache
+
+from config import http
+
+from .extractor import extract_metadata
+from .urlnorm import normalize_url
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL = 60 * 60 * 24
+NEGATIVE_CACHE_TTL = 60 * 5
+# 取得中ロックの有効期限（取得したワーカーが落ちてもこの時間で解放される）
+LOCK_TTL = 30
+WAIT_TIMEOUT = 20
+WAIT_INTERVAL = 0.2
+
+
+def cache_key(url: str) -> str:
+    digest = hashlib.sha256(normalize_url(url).encode()).hexdigest()
+    return f"bookmark:ogp:{digest}"
+
+
+def fetch_ogp(url: str) -> dict:
+    # <head> だけを読み込む
+    response = http.get(url, stream=True, verify=False)
+    # エラーページのタイトルを結果にしないよう、失敗として短い期間だけキャッシュする
+    if not response.ok:
+        response.close()
+        response.raise_for_status()
+    page = extract_metadata(response, base_url=url)
+    og_data = page.og
+
+    # 説明文（OGP descriptionがない場合はmeta descriptionを使用）
+    description = og_data.get("description", "") or page.description
+
+    return {
+        "url": url,
+        "title": og_data.get("title", page.title),
+        "description": description,
+        "image": og_data.get("image", ""),
+        "type": og_data.get("type", ""),
+        "site_name": og_data.get("site_name", ""),
+        "favicon_url": page.favicon_url,
+        "success": True,
+    }
+
+
+def _fetch_and_cache(url: str, key: str) -> dict:
+    try:
+        result = fetch_ogp(url)
+    except Exception as e:  # noqa: BLE001
+        logger.info("Error fetching OGP data for %s: %s", url, e)
+        result = {"error": str(e), "success": False}
+        cache.set(key, result, NEGATIVE_CACHE_TTL)
+        return result
+    cache.set(key, result, CACHE_TTL)
+    return result
+
+
+def get_ogp(url: str) -> dict:
+    """キャッシュ済みの結果を返し、なければ取得する（同じ URL の同時取得は1回にまとめる）"""
+    key = cache_key(url)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, LOCK_TTL):
+        try:
+            return _fetch_and_cache(url, key)
+        finally:
+            cache.delete(lock_key)
+
+    # 他のワーカーが取得中なので結果が入るのを待つ
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        result = cache.get(key)
+        if result is not None:
+            return result
+        if cache.get(lock_key) is None:
+            break
+    return _fetch_and_cache(url, key)
@@ -0,0 +1,102 @@
+"""ブックマーク一覧のキーセット（カーソル）ページング
+
+OFFSET の代わりに直前のページの最後の行のキーより後ろを取得するため、
+何ページ目でも同じコストで取得できる。カーソルはキーを JSON にして base64 で包んだもの。
+"""
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db import connections
+from django.db.models import Q
+
+# 並び順ごとのキー（ORDER BY の列）
+ORDERINGS = {
+    "id": ("-id",),
+    "created": ("-created_at", "-id"),
+}
+
+
+@dataclass
+class CursorPage:
+    items: list
+    next_cursor: str
+    has_next: bool
+
+
+def encode_cursor(values: dict) -> str:
+    data = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """カーソルを復元する。不正な値の場合は None（先頭ページ扱い）"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        return values if isinstance(values, dict) else None
+    except (ValueError, binascii.Error):
+        return None
+
+
+# 64 ビット整数の範囲（改ざんされたカーソルの巨大な値で DB のエラーにしない）
+MAX_ID = 2**63 - 1
+
+
+def _after(values: dict, ordering: str) -> Q:
+    """カーソルの位置より後ろ（降順なので小さい方）の行の条件
+
+    改ざんされたカーソルなど、値が不正な場合は ValueError を送出する。
+    """
+    pk = values["id"]
+    if type(pk) is not int or not 0 <= pk <= MAX_ID:
+        raise ValueError(f"Invalid cursor id: {pk!r}")
+    if ordering == "created":
+        created_at = datetime.fromisoformat(values["created_at"])
+        if created_at.tzinfo is None:
+            raise ValueError("Cursor created_at must be timezone-aware")
+        return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+    return Q(id__lt=pk)
+
+
+def _key(item, ordering: str) -> dict:
+    if ordering == "created":
+        return {"created_at": item.created_at.isoformat(), "id": item.id}
+    return {"id": item.id}
+
+
+def paginate_keyset(queryset, cursor="", per_page=50, ordering="id") -> CursorPage:
+    if ordering not in ORDERINGS:
+        ordering = "id"
+    values = decode_cursor(cursor)
+    if values:
+        try:
+            queryset = queryset.filter(_after(values, ordering))
+        except (KeyError, TypeError, ValueError):
+            # 不正なカーソルは先頭ページとして扱う
+            pass
+    # 1件多く取得して次のページがあるかを判定する（COUNT は発行しない）
+    rows = list(queryset.order_by(*ORDERINGS[ordering])[: per_page + 1])
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = encode_cursor(_key(rows[-1], ordering)) if has_next else ""
+    return CursorPage(items=rows, next_cursor=next_cursor, has_next=has_next)
+
+
+def estimate_count(queryset):
+    """件数の概算。PostgreSQL で絞り込みがない場合だけ統計情報から返し、それ以外は None"""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql" or queryset.query.where:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    return max(row[0], 0) if row else None
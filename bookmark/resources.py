@@ -0,0 +1,33 @@
+from import_export import fields, resources
+from import_export.widgets import ForeignKeyWidget, ManyToManyWidget
+
+from .exporter import CHUNK_SIZE, export_queryset
+from .models import Category, Item, Tag
+
+
+class ItemResource(resources.ModelResource):
+    """管理画面のインポート・エクスポート用"""
+
+    category = fields.Field(
+        attribute="category",
+        column_name="category",
+        widget=ForeignKeyWidget(Category, field="name"),
+    )
+    tags = fields.Field(
+        attribute="tags",
+        column_name="tags",
+        widget=ManyToManyWidget(Tag, field="name"),
+    )
+
+    class Meta:
+        model = Item
+        fields = ("id", "url", "title", "description", "category", "tags", "created_at")
+        chunk_size = CHUNK_SIZE
+
+    def get_queryset(self):
+        return export_queryset()
+
+    def iter_queryset(self, queryset):
+        # Django 4.1 以降は iterator() でもチャンクごとに prefetch_related が効くので
+        # ページ分割（件数の COUNT と OFFSET）を使わずに読み込む
+        yield from queryset.order_by("pk").iterator(chunk_size=self.get_chunk_size())
@@ -0,0 +1,228 @@
+"""ブックマークの全文検索インデックス
+
+日本語は単語の区切りがないため、文字 n-gram で索引を作る。
+
+- SQLite: FTS5 の trigram トークナイザ（rowid = Item.id）
+- PostgreSQL: pg_trgm の GIN インデックス（部分一致）と tsvector（英語の順位付け）
+
+インデックスは bookmark_item とは別テーブルで、signals で Item の保存・削除に合わせて更新する。
+bulk_create / bulk_update はシグナルが発行されないため、呼び出し側で index_items() を呼ぶ。
+それ以外のデータベースではインデックスを作らず、icontains で検索する。
+"""
+
+from django.db import connection as default_connection
+from django.db.models import Q
+
+from .models import Item
+
+SQLITE_TABLE = "bookmark_item_fts"
+POSTGRES_TABLE = "bookmark_item_search"
+# 索引を作るフィールド（この順で FTS5 の列になる）
+FIELDS = ("title", "og_title", "description", "og_description", "url")
+# bm25 の列ごとの重み（タイトルを優先する）
+SQLITE_WEIGHTS = (10.0, 8.0, 3.0, 2.0, 1.0)
+# trigram トークナイザで索引を引ける最小の文字数
+MIN_TERM_LENGTH = 3
+DEFAULT_LIMIT = 100
+BATCH_SIZE = 500
+
+
+def is_supported(connection=default_connection) -> bool:
+    return connection.vendor in ("sqlite", "postgresql")
+
+
+def install(connection=default_connection) -> None:
+    """インデックス用のテーブルを作成する（rebuild_search_index コマンドから呼ばれる）"""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} "
+                f"USING fts5({', '.join(FIELDS)}, tokenize='trigram')"
+            )
+        elif connection.vendor == "postgresql":
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ("
+                "item_id bigint PRIMARY KEY"
+                f" REFERENCES {Item._meta.db_table} (id) ON DELETE CASCADE,"
+                " document text NOT NULL,"
+                " vector tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_document_trgm "
+                f"ON {POSTGRES_TABLE} USING gin (document gin_trgm_ops)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_vector "
+                f"ON {POSTGRES_TABLE} USING gin (vector)"
+            )
+
+
+def _insert_sql(connection, where):
+    """bookmark_item から直接インデックスへ書き込む SQL"""
+    item_table = Item._meta.db_table
+    if connection.vendor == "sqlite":
+        return (
+            f"INSERT INTO {SQLITE_TABLE} (rowid, {', '.join(FIELDS)}) "
+            f"SELECT id, {', '.join(FIELDS)} FROM {item_table} {where}"
+        )
+    return (
+        f"INSERT INTO {POSTGRES_TABLE} (item_id, document, vector) "
+        f"SELECT id, lower(concat_ws(' ', {', '.join(FIELDS)})),"
+        " setweight(to_tsvector('simple', title || ' ' || og_title), 'A')"
+        " || setweight(to_tsvector('simple', description || ' ' || og_description), 'B')"
+        " || setweight(to_tsvector('simple', url), 'D') "
+        f"FROM {item_table} {where} "
+        "ON CONFLICT (item_id) DO UPDATE"
+        " SET document = EXCLUDED.document, vector = EXCLUDED.vector"
+    )
+
+
+def _batches(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start : start + BATCH_SIZE]
+
+
+def index_items(ids, connection=default_connection) -> None:
+    """指定したアイテムのインデックスを作り直す"""
+    if not is_supported(connection):
+        return
+    for batch in _batches(ids):
+        placeholders = ", ".join(["%s"] * len(batch))
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                # FTS5 は UPSERT に対応していないので消してから入れ直す
+                cursor.execute(
+                    f"DELETE FROM {SQLITE_TABLE} WHERE rowid IN ({placeholders})",
+                    batch,
+                )
+            cursor.execute(
+                _insert_sql(connection, f"WHERE id IN ({placeholders})"), batch
+            )
+
+
+def remove_items(ids, connection=default_connection) -> None:
+    if not is_supported(connection):
+        return
+    table, key = (
+        (SQLITE_TABLE, "rowid")
+        if connection.vendor == "sqlite"
+        else (POSTGRES_TABLE, "item_id")
+    )
+    for batch in _batches(ids):
+        placeholders = ", ".join(["%s"] * len(batch))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE {key} IN ({placeholders})", batch
+            )
+
+
+def rebuild(connection=default_connection) -> int:
+    """インデックスを全件作り直し、登録した件数を返す"""
+    if not is_supported(connection):
+        return 0
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"DELETE FROM {SQLITE_TABLE}")
+            cursor.execute(_insert_sql(connection, ""))
+            # 細かく分かれたセグメントを1つにまとめる
+            cursor.execute(
+                f"INSERT INTO {SQLITE_TABLE} ({SQLITE_TABLE}) VALUES ('optimize')"
+            )
+            cursor.execute(f"SELECT count(*) FROM {SQLITE_TABLE}")
+        else:
+            cursor.execute(f"TRUNCATE {POSTGRES_TABLE}")
+            cursor.execute(_insert_sql(connection, ""))
+            cursor.execute(f"ANALYZE {POSTGRES_TABLE}")
+            cursor.execute(f"SELECT count(*) FROM {POSTGRES_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def split_terms(query: str) -> list:
+    """検索語を空白（全角空白を含む）で区切る。大文字小文字は区別しない"""
+    return [term for term in query.lower().split() if term]
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _search_sqlite(connection, terms, limit):
+    long_terms = [term for term in terms if len(term) >= MIN_TERM_LENGTH]
+    short_terms = [term for term in terms if len(term) < MIN_TERM_LENGTH]
+    conditions, params = [], []
+    if long_terms:
+        # 各語をフレーズにして AND で検索する
+        conditions.append(f"{SQLITE_TABLE} MATCH %s")
+        params.append(" ".join(_fts_phrase(term) for term in long_terms))
+    for term in short_terms:
+        # 2文字以下は trigram の索引を使えないので LIKE で絞り込む
+        conditions.append(
+            "(" + " OR ".join(f"{field} LIKE %s ESCAPE '\\'" for field in FIELDS) + ")"
+        )
+        params.extend([_like_pattern(term)] * len(FIELDS))
+    if long_terms:
+        weights = ", ".join(str(weight) for weight in SQLITE_WEIGHTS)
+        order = f"bm25({SQLITE_TABLE}, {weights}), rowid DESC"
+    else:
+        order = "rowid DESC"
+    sql = (
+        f"SELECT rowid FROM {SQLITE_TABLE} WHERE {' AND '.join(conditions)} "
+        f"ORDER BY {order} LIMIT %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search_postgres(connection, terms, limit):
+    conditions = " AND ".join(["document LIKE %s"] * len(terms))
+    query = " ".join(terms)
+    sql = (
+        f"SELECT item_id FROM {POSTGRES_TABLE} WHERE {conditions} "
+        "ORDER BY ts_rank(vector, plainto_tsquery('simple', %s))"
+        " + similarity(document, %s) DESC, item_id DESC LIMIT %s"
+    )
+    params = [_like_pattern(term) for term in terms] + [query, query, limit]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search_fallback(terms, limit):
+    queryset = Item.objects.all()
+    for term in terms:
+        condition = Q()
+        for field in FIELDS:
+            condition |= Q(**{f"{field}__icontains": term})
+        queryset = queryset.filter(condition)
+    return list(queryset.order_by("-id").values_list("id", flat=True)[:limit])
+
+
+def search_ids(query: str, limit=DEFAULT_LIMIT, connection=default_connection):
+    """検索語にすべて一致するアイテムの ID を関連度の高い順に返す"""
+    terms = split_terms(query)
+    if not terms:
+        return []
+    if connection.vendor == "sqlite":
+        return _search_sqlite(connection, terms, limit)
+    if connection.vendor == "postgresql":
+        return _search_postgres(connection, terms, limit)
+    return _search_fallback(terms, limit)
+
+
+def search(query: str, queryset=None, limit=DEFAULT_LIMIT) -> list:
+    """検索結果のアイテムを関連度の高い順に返す"""
+    ids = search_ids(query, limit)
+    if not ids:
+        return []
+    if queryset is None:
+        queryset = Item.objects.for_listing()
+    items = {item.id: item for item in queryset.filter(id__in=ids)}
+    return [items[pk] for pk in ids if pk in items]
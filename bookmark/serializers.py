@@ -0,0 +1,124 @@
+from rest_framework import serializers
+
+from .models import Category, Item, Tag
+from .taxonomy import resolve_categories, resolve_tags
+
+
+class TagNamesField(serializers.ListField):
+    """タグを名前のリストとして読み書きする"""
+
+    child = serializers.CharField(max_length=200)
+
+    def to_representation(self, tags):
+        return [tag.name for tag in tags.all()]
+
+
+class SparseFieldsMixin:
+    """?fields=id,url,title のように、返すフィールドをリクエストで絞り込めるようにする"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.requested_fields(self.context.get("request"))
+        if fields:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+    @staticmethod
+    def requested_fields(request):
+        if request is None or request.method != "GET":
+            return None
+        value = request.query_params.get("fields", "")
+        fields = {name.strip() for name in value.split(",") if name.strip()}
+        return fields or None
+
+
+class TagSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Tag
+        fields = ("id", "name", "item_count")
+        read_only_fields = ("item_count",)
+
+
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ("id", "name", "item_count")
+        read_only_fields = ("item_count",)
+
+
+class ItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """カテゴリ・タグは名前でやり取りし、存在しない名前は作成する"""
+
+    category = serializers.CharField(
+        source="category.name", allow_blank=True, allow_null=True, required=False
+    )
+    tags = TagNamesField(required=False)
+    og_image = serializers.SerializerMethodField()
+    favicon = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Item
+        fields = (
+            "id",
+            "url",
+            "title",
+            "description",
+            "category",
+            "tags",
+            "og_title",
+            "og_description",
+            "og_site_name",
+            "og_image",
+            "favicon",
+            "created_at",
+            "last_metadata_update",
+        )
+        read_only_fields = (
+            "og_title",
+            "og_description",
+            "og_site_name",
+            "created_at",
+            "last_metadata_update",
+        )
+
+    def get_og_image(self, item):
+        return "/" + item.og_image.name if item.og_image else None
+
+    def get_favicon(self, item):
+        return "/" + item.favicon.name if item.favicon else None
+
+    def _pop_relations(self, validated_data):
+        category = validated_data.pop("category", None)
+        tags = validated_data.pop("tags", None)
+        if category is not None:
+            name = (category.get("name") or "").strip()
+            validated_data["category"] = (
+                resolve_categories([name])[name] if name else None
+            )
+        return tags
+
+    def create(self, validated_data):
+        tags = self._pop_relations(validated_data)
+        item = super().create(validated_data)
+        if tags:
+            item.tags.add(*resolve_tags(tags).values())
+        return item
+
+    def update(self, item, validated_data):
+        tags = self._pop_relations(validated_data)
+        item = super().update(item, validated_data)
+        if tags is not None:
+            item.tags.set(resolve_tags(tags).values())
+        return item
+
+
+class BulkItemSerializer(serializers.Serializer):
+    """一括登録・更新の1件分。url 以外は指定したものだけを更新する"""
+
+    url = serializers.URLField(max_length=2000)
+    title = serializers.CharField(max_length=512, required=False, allow_blank=True)
+    description = serializers.CharField(required=False, allow_blank=True)
+    category = serializers.CharField(max_length=200, required=False, allow_blank=True)
+    tags = serializers.ListField(
+        child=serializers.CharField(max_length=200), required=False
+    )
@@ -0,0 +1,34 @@
+"""サイドバーのカテゴリ一覧（カテゴリごとの件数付き）のキャッシュ
+
+件数は Category.item_count（facets）から読み、共有キャッシュに「バージョン付きのキー」で保存する。
+カテゴリやアイテムが変更されたら signals でバージョンを更新するので、古い件数が
+表示されることはなく、古いバージョンのデータは有効期限で消える。
+"""
+
+import uuid
+
+from django.core.cache import cache
+
+from . import facets
+
+VERSION_KEY = "bookmark:sidebar:version"
+CACHE_TTL = 60 * 60 * 24
+
+
+def invalidate() -> None:
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _cache_key() -> str:
+    version = cache.get_or_set(VERSION_KEY, lambda: uuid.uuid4().hex, None)
+    return f"bookmark:sidebar:categories:{version}"
+
+
+def get_categories() -> list:
+    """カテゴリごとの id, name, item_count の辞書のリスト"""
+    key = _cache_key()
+    categories = cache.get(key)
+    if categories is None:
+        categories = facets.category_counts()
+        cache.set(key, categories, CACHE_TTL)
+    return categories
@@ -0,0 +1,144 @@
+from django.db import transaction
+from django.db.models import DEFERRED
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from . import facets, fragments, search, sidebar, tag_index
+from .models import Category, Item, Tag
+
+
+@receiver(post_save, sender=Item)
+def index_item(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_items([instance.pk])
+
+
+@receiver(post_delete, sender=Item)
+def remove_item(sender, instance, **kwargs):
+    search.remove_items([instance.pk])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_index(sender, **kwargs):
+    tag_index.invalidate()
+
+
+@receiver(m2m_changed, sender=Item.tags.through)
+def update_tag_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    Through = Item.tags.through
+    if action in ("pre_remove", "pre_clear"):
+        # remove() の pk_set には付いていないタグも含まれるので、実際に外れる組を数えておく
+        if reverse:
+            links = Through.objects.filter(tag_id=instance.pk)
+            if pk_set is not None:
+                links = links.filter(item_id__in=pk_set)
+            instance._removed_tag_counts = {instance.pk: links.count()}
+        else:
+            links = Through.objects.filter(item_id=instance.pk)
+            if pk_set is not None:
+                links = links.filter(tag_id__in=pk_set)
+            tag_ids = links.values_list("tag_id", flat=True)
+            instance._removed_tag_counts = {tag_id: 1 for tag_id in tag_ids}
+    elif action in ("post_remove", "post_clear"):
+        counts = getattr(instance, "_removed_tag_counts", {})
+        facets.add_tag_counts({pk: -count for pk, count in counts.items()})
+        instance._removed_tag_counts = {}
+    elif action == "post_add" and pk_set:
+        # post_add の pk_set は新しく追加された分だけ
+        if reverse:
+            facets.add_tag_counts({instance.pk: len(pk_set)})
+        else:
+            facets.add_tag_counts({pk: 1 for pk in pk_set})
+
+
+@receiver(post_save, sender=Item)
+def update_category_count(sender, instance, created, update_fields=None, **kwargs):
+    new = instance.category_id
+    if created:
+        facets.add_category_counts({new: 1})
+    elif update_fields is None or "category" in update_fields:
+        old = getattr(instance, "_loaded_category_id", DEFERRED)
+        # 読み込み時にカテゴリを取得していない場合は分からないので補正に任せる
+        if old is not DEFERRED and old != new:
+            facets.add_category_counts({old: -1, new: 1})
+    instance._loaded_category_id = new
+
+
+@receiver(pre_delete, sender=Item)
+def remember_tags(sender, instance, **kwargs):
+    # アイテムの削除で中間テーブルの行も消えるが、m2m_changed は発行されない
+    instance._deleted_tag_ids = list(
+        Item.tags.through.objects.filter(item_id=instance.pk).values_list(
+            "tag_id", flat=True
+        )
+    )
+
+
+@receiver(post_delete, sender=Item)
+def decrement_counts(sender, instance, **kwargs):
+    facets.add_tag_counts({pk: -1 for pk in getattr(instance, "_deleted_tag_ids", [])})
+    facets.add_category_counts({instance.category_id: -1})
+
+
+# サイドバーは件数の更新（上の receiver）より後に登録し、コミット後に無効化する。
+# コミット前に無効化すると、他のリクエストが古い件数を読んでキャッシュし直してしまう
+@receiver(post_save, sender=Item)
+def invalidate_sidebar_on_item_save(
+    sender, instance, created, update_fields=None, **kwargs
+):
+    # メタデータの更新など、カテゴリが変わらない保存では件数は変わらない
+    if created or update_fields is None or "category" in update_fields:
+        transaction.on_commit(sidebar.invalidate)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Item)
+def invalidate_sidebar(sender, **kwargs):
+    transaction.on_commit(sidebar.invalidate)
+
+
+@receiver(m2m_changed, sender=Item.tags.through)
+def bump_render_version_on_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    """タグの付け替えで一覧の HTML 断片が変わるので render_version を更新する"""
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            instance.render_version = fragments.bump([instance.pk])
+    elif action == "pre_clear":
+        instance._cleared_item_ids = list(
+            Item.tags.through.objects.filter(tag_id=instance.pk).values_list(
+                "item_id", flat=True
+            )
+        )
+    elif action in ("post_add", "post_remove") and pk_set:
+        fragments.bump(pk_set)
+    elif action == "post_clear":
+        fragments.bump(getattr(instance, "_cleared_item_ids", []))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def bump_render_version_on_tag(sender, instance, created=False, **kwargs):
+    # 名前の変更・削除はそのタグが付いたアイテムの表示に影響する
+    if not created:
+        fragments.bump(
+            Item.tags.through.objects.filter(tag_id=instance.pk).values_list(
+                "item_id", flat=True
+            )
+        )
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def bump_render_version_on_category(sender, instance, created=False, **kwargs):
+    if not created:
+        fragments.bump(
+            Item.objects.filter(category_id=instance.pk).values_list("id", flat=True)
+        )
@@ -0,0 +1,78 @@
+import hashlib
+import posixpath
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+from .thumbnails import delete_variants, generate_variants
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """内容の SHA-256 をファイル名にするストレージ
+
+    同じ内容のファイルは1つだけ保存され、2回目以降の保存ではディスクに書き込まない。
+    削除はどのレコードからも参照されなくなった時だけ行うため、django_cleanup が
+    古いファイルを消そうとしても他のアイテムが使っているファイルは残る。
+    新しい画像を保存した時に縮小版も生成し、元ファイルと一緒に削除する。
+    """
+
+    # このストレージのファイルを参照するモデルとフィールド
+    references = (
+        ("bookmark.Item", "favicon"),
+        ("bookmark.Item", "og_image"),
+        ("bookmark.DomainFavicon", "favicon"),
+    )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        name = self.content_name(name, digest.hexdigest())
+        if self.exists(name):
+            return name
+        name = super().save(name, content, max_length)
+        generate_variants(self, name)
+        return name
+
+    def save_derived(self, name, content):
+        """縮小版など、元ファイルから作ったファイルを指定した名前のまま保存する"""
+        return super().save(name, content)
+
+    def delete_derived(self, name):
+        super().delete(name)
+
+    @staticmethod
+    def content_name(name, digest):
+        """upload_to が返したパスのファイル名部分をハッシュに置き換える"""
+        directory, filename = posixpath.split(name)
+        _, ext = posixpath.splitext(filename)
+        return posixpath.join(
+            directory, digest[:2], digest[2:4], f"{digest}{ext.lower()}"
+        )
+
+    def is_referenced(self, name) -> bool:
+        for model_label, field_name in self.references:
+            model = apps.get_model(model_label)
+            if model._default_manager.filter(**{field_name: name}).exists():
+                return True
+        return False
+
+    def delete(self, name):
+        if self.is_referenced(name):
+            return
+        super().delete(name)
+        delete_variants(self, name)
+
+
+content_store = ContentAddressedStorage()
+
+
+def get_content_store():
+    return content_store
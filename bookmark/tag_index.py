@@ -0,0 +1,63 @@
+"""タグ名の前方一致検索（入力補完）用のメモリ上の索引
+
+タグ名を小文字化した値でソートしたリストを各プロセスに持ち、二分探索で前方一致を探す。
+タグが追加・変更されたら共有キャッシュのバージョンを更新し、各プロセスは次の検索時に
+バージョンの違いに気付いて索引を作り直す。
+"""
+
+import threading
+import uuid
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+VERSION_KEY = "bookmark:tag_index:version"
+DEFAULT_LIMIT = 10
+
+_lock = threading.Lock()
+# (バージョン, 小文字化した名前のリスト, 元の名前のリスト) をまとめて差し替える
+_index = (None, [], [])
+
+
+def invalidate() -> None:
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _current_version() -> str:
+    return cache.get_or_set(VERSION_KEY, lambda: uuid.uuid4().hex, None)
+
+
+def _load():
+    global _index
+    from .models import Tag
+
+    version = _current_version()
+    index = _index
+    if index[0] == version:
+        return index
+    with _lock:
+        if _index[0] != version:
+            entries = sorted(
+                (name.casefold(), name)
+                for name in Tag.objects.values_list("name", flat=True)
+            )
+            _index = (
+                version,
+                [key for key, _ in entries],
+                [name for _, name in entries],
+            )
+        return _index
+
+
+def complete(prefix: str, limit=DEFAULT_LIMIT) -> list:
+    """prefix で始まるタグ名を最大 limit 件返す（大文字小文字は区別しない）"""
+    prefix = prefix.strip().casefold()
+    if not prefix:
+        return []
+    _, keys, names = _load()
+    results = []
+    index = bisect_left(keys, prefix)
+    while index < len(keys) and len(results) < limit and keys[index].startswith(prefix):
+        results.append(names[index])
+        index += 1
+    return results
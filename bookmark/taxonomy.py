@@ -0,0 +1,62 @@
+"""カテゴリ・タグを名前からまとめて解決する
+
+名前ごとに get_or_create を呼ぶと件数分のクエリが発行されるため、
+既存のものを1回で取得し、足りないものだけを bulk_create する。
+"""
+
+from django.db import transaction
+
+from . import sidebar, tag_index
+from .models import Category, Tag
+
+NAME_MAX_LENGTH = 200
+
+
+def clean_names(names) -> list:
+    """前後の空白を除き、空の名前と重複を取り除く（順序は保つ）"""
+    cleaned = {}
+    for name in names:
+        name = (name or "").strip()[:NAME_MAX_LENGTH]
+        if name:
+            cleaned.setdefault(name, None)
+    return list(cleaned)
+
+
+def _resolve(model, names):
+    """名前からオブジェクトへの辞書と、新しく作成したかどうかを返す"""
+    names = clean_names(names)
+    if not names:
+        return {}, False
+    found = {obj.name: obj for obj in model.objects.filter(name__in=names)}
+    missing = [name for name in names if name not in found]
+    if missing:
+        # 同時に他のリクエストが作成した場合に備えて、作成後に取得し直す
+        model.objects.bulk_create(
+            [model(name=name) for name in missing], ignore_conflicts=True
+        )
+        found.update((obj.name, obj) for obj in model.objects.filter(name__in=missing))
+    return found, bool(missing)
+
+
+def split_names(value: str) -> list:
+    """カンマ区切り（全角の「、」「，」を含む）の入力を名前のリストにする"""
+    for separator in ("、", "，"):
+        value = value.replace(separator, ",")
+    return clean_names(value.split(","))
+
+
+def resolve_categories(names) -> dict:
+    """カテゴリ名から Category への辞書（存在しないものは作成する）"""
+    found, created = _resolve(Category, names)
+    if created:
+        transaction.on_commit(sidebar.invalidate)
+    return found
+
+
+def resolve_tags(names) -> dict:
+    """タグ名から Tag への辞書（存在しないものは作成する）"""
+    found, created = _resolve(Tag, names)
+    if created:
+        # bulk_create ではシグナルが発行されないため、ここで補完用の索引を無効にする
+        tag_index.invalidate()
+    return found
@@ -0,0 +1,12 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from bookmark.fragments import render_items as render_fragments
+
+register = template.Library()
+
+
+@register.simple_tag
+def render_items(items, layout):
+    """アイテムのカード（layout="card"）または行（"list"）をキャッシュを使って表示する"""
+    return mark_safe("".join(render_fragments(items, layout)))
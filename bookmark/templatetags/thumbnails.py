@@ -0,0 +1,29 @@
+from django import template
+
+from bookmark.thumbnails import available_widths, variant_name
+
+register = template.Library()
+
+
+@register.inclusion_tag("bookmark/components/picture.html")
+def picture(file, width, height, sizes, css_class="", alt=""):
+    """縮小版（WebP）の srcset 付きで画像を表示する。縮小版がない場合は元画像のみ
+
+    縮小版の導入前に保存した画像は generate_thumbnails を実行するまで縮小版がないので、
+    実際にあるものだけを srcset に入れる（描画結果は一覧の断片キャッシュに残る）。
+    """
+    candidates = []
+    for w in available_widths(file.name, width):
+        name = variant_name(file.name, w)
+        if file.storage.exists(name):
+            candidates.append(f"/{name} {w}w")
+    srcset = ", ".join(candidates)
+    return {
+        "src": f"/{file.name}",
+        "srcset": srcset,
+        "sizes": sizes,
+        "width": width,
+        "height": height,
+        "css_class": css_class,
+        "alt": alt,
+    }
@@ -1 +1,622 @@
-# Create your tests here.
+import base64
+import io
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import facets, fragments, importer, jobs, sidebar
+from .extractor import extract_metadata, sniff_charset
+from .models import Category, Item, MetadataJob, Tag
+from .pagination import decode_cursor, encode_cursor, paginate_keyset
+from .search import search_ids
+from .urlnorm import canonicalize_url, normalize_url, url_hash
+
+
+class MetadataJobTests(TestCase):
+    def setUp(self):
+        # 保存時にメタデータ取得ジョブが登録される
+        self.item = Item.objects.create(url="https://example.com/", title="Example")
+        self.job = MetadataJob.objects.get(item=self.item)
+
+    def test_claim_only_once(self):
+        self.assertTrue(jobs.claim(self.job))
+        self.assertFalse(jobs.claim(self.job))
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, MetadataJob.Status.RUNNING)
+
+    def test_claim_expired_lock(self):
+        jobs.claim(self.job)
+        MetadataJob.objects.filter(pk=self.job.pk).update(
+            locked_at=timezone.now() - MetadataJob.LOCK_TIMEOUT - timedelta(seconds=1)
+        )
+        self.job.refresh_from_db()
+        self.assertTrue(jobs.claim(self.job))
+
+    def test_backoff(self):
+        self.assertEqual(jobs.backoff(1), jobs.BACKOFF_BASE)
+        self.assertEqual(jobs.backoff(3), jobs.BACKOFF_BASE * 4)
+        self.assertEqual(jobs.backoff(20), jobs.BACKOFF_MAX)
+
+    def test_retry_with_backoff(self):
+        with (
+            mock.patch.object(Item, "fetch_metadata", side_effect=OSError("down")),
+            self.assertLogs("bookmark.jobs", "WARNING"),
+        ):
+            self.assertEqual(jobs.process_jobs(), 1)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, MetadataJob.Status.PENDING)
+        self.assertEqual(self.job.attempts, 1)
+        self.assertEqual(self.job.last_error, "down")
+        self.assertGreater(self.job.run_at, timezone.now())
+
+    def test_fail_after_max_attempts(self):
+        MetadataJob.objects.filter(pk=self.job.pk).update(
+            attempts=jobs.MAX_ATTEMPTS - 1
+        )
+        with (
+            mock.patch.object(Item, "fetch_metadata", side_effect=OSError("down")),
+            self.assertLogs("bookmark.jobs", "WARNING"),
+        ):
+            jobs.process_jobs()
+        self.job.refresh_from_db()
+        self.item.refresh_from_db()
+        self.assertEqual(self.job.status, MetadataJob.Status.FAILED)
+        self.assertEqual(self.job.attempts, jobs.MAX_ATTEMPTS)
+        self.assertIsNotNone(self.job.finished_at)
+        self.assertIsNotNone(self.item.last_metadata_update)
+
+    def test_done(self):
+        with mock.patch.object(Item, "fetch_metadata"):
+            jobs.process_jobs()
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, MetadataJob.Status.DONE)
+        self.assertFalse(MetadataJob.objects.due().exists())
+
+    def test_item_deleted_while_fetching(self):
+        def delete_item():
+            Item.objects.filter(pk=self.item.pk).delete()
+
+        with mock.patch.object(Item, "fetch_metadata", side_effect=delete_item):
+            # ワーカーを止めずにジョブを捨てる
+            jobs.process_jobs()
+        self.assertFalse(MetadataJob.objects.exists())
+
+    def test_unexpected_error_does_not_stop_other_jobs(self):
+        other = Item.objects.create(url="https://example.org/", title="Other")
+        run_job = jobs.run_job
+
+        def run(job):
+            if job.item_id == self.item.pk:
+                raise RuntimeError("boom")
+            run_job(job)
+
+        with (
+            mock.patch.object(Item, "fetch_metadata"),
+            mock.patch.object(jobs, "run_job", side_effect=run),
+            self.assertLogs("bookmark.jobs", "ERROR"),
+        ):
+            self.assertEqual(jobs.process_jobs(), 1)
+        self.assertEqual(
+            MetadataJob.objects.get(item=other).status, MetadataJob.Status.DONE
+        )
+        # 失敗したジョブは実行中のまま残り、ロックが切れたら再実行される
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, MetadataJob.Status.RUNNING)
+
+
+class UrlNormTests(SimpleTestCase):
+    def test_scheme_and_host_case(self):
+        self.assertEqual(
+            canonicalize_url("HTTPS://Example.COM/Path"), "https://example.com/Path"
+        )
+
+    def test_http_is_https(self):
+        self.assertEqual(
+            canonicalize_url("http://example.com/a"), "https://example.com/a"
+        )
+
+    def test_default_port(self):
+        self.assertEqual(normalize_url("http://example.com:80/"), "http://example.com/")
+        self.assertEqual(
+            normalize_url("https://example.com:443/"), "https://example.com/"
+        )
+        self.assertEqual(
+            normalize_url("https://example.com:8443/"), "https://example.com:8443/"
+        )
+
+    def test_tracking_params(self):
+        self.assertEqual(
+            canonicalize_url(
+                "https://example.com/?utm_source=x&utm_medium=y&fbclid=1&gclid=2&id=3"
+            ),
+            "https://example.com/?id=3",
+        )
+
+    def test_query_order(self):
+        self.assertEqual(
+            url_hash("https://example.com/?b=2&a=1"),
+            url_hash("https://example.com/?a=1&b=2"),
+        )
+
+    def test_trailing_slash(self):
+        self.assertEqual(
+            canonicalize_url("https://example.com/a/"), "https://example.com/a"
+        )
+        self.assertEqual(
+            canonicalize_url("https://example.com"), "https://example.com/"
+        )
+
+    def test_fragment(self):
+        self.assertEqual(
+            normalize_url("https://example.com/a#section"), "https://example.com/a"
+        )
+
+    def test_malformed(self):
+        for url in ("https://x.com:99999/", "http://[::1", " http://[::1 "):
+            with self.subTest(url=url):
+                self.assertEqual(canonicalize_url(url), url.strip())
+                self.assertEqual(len(url_hash(url)), 64)
+
+
+NETSCAPE_HTML = """<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">
+<TITLE>Bookmarks</TITLE>
+<H1>Bookmarks</H1>
+<DL><p>
+    <DT><H3 ADD_DATE="1700000000">Dev</H3>
+    <DL><p>
+        <DT><A HREF="https://docs.djangoproject.com/" ADD_DATE="1700000000" TAGS="python,django">Django</A>
+        <DD>The web framework
+        <DT><A HREF="https://peps.python.org/">PEPs</A>
+    </DL><p>
+    <DT><A HREF="https://example.com/">Example &amp; Co</A>
+</DL><p>
+"""
+
+
+class ImporterParserTests(SimpleTestCase):
+    def test_netscape(self):
+        bookmarks = list(importer.parse_netscape(io.StringIO(NETSCAPE_HTML)))
+        self.assertEqual(
+            [(b.url, b.title, b.category) for b in bookmarks],
+            [
+                ("https://docs.djangoproject.com/", "Django", "Dev"),
+                ("https://peps.python.org/", "PEPs", "Dev"),
+                ("https://example.com/", "Example & Co", ""),
+            ],
+        )
+        self.assertEqual(bookmarks[0].description, "The web framework")
+        self.assertEqual(bookmarks[0].tags, ["python", "django"])
+        self.assertEqual(bookmarks[0].created_at.year, 2023)
+        self.assertEqual(bookmarks[1].description, "")
+
+    def test_jsonl(self):
+        stream = io.StringIO(
+            '{"url": "https://example.com/", "title": "Example", "tags": ["a", "b"],'
+            ' "created_at": "2024-01-02T03:04:05"}\n'
+            "\n"
+            "not json\n"
+            '["not", "an", "object"]\n'
+            '{"url": "https://example.org/", "tags": "c, d", "category": "Misc"}\n'
+        )
+        bookmarks = list(importer.parse_jsonl(stream))
+        self.assertEqual(
+            [(b.url, b.category) for b in bookmarks],
+            [("https://example.com/", ""), ("https://example.org/", "Misc")],
+        )
+        self.assertEqual(bookmarks[0].tags, ["a", "b"])
+        self.assertEqual(bookmarks[0].created_at.tzinfo, importer.timezone.utc)
+        self.assertEqual(bookmarks[1].tags, ["c", " d"])
+
+    def test_chrome_json(self):
+        data = {
+            "roots": {
+                "bookmark_bar": {
+                    "type": "folder",
+                    "name": "Bookmarks bar",
+                    "children": [
+                        {
+                            "type": "url",
+                            "name": "Example",
+                            "url": "https://example.com/",
+                            # 2024-01-01T00:00:00Z
+                            "date_added": str(
+                                1704067200 * 1000000 + importer.CHROME_EPOCH_OFFSET
+                            ),
+                        },
+                        {
+                            "type": "folder",
+                            "name": "Dev",
+                            "children": [
+                                {
+                                    "type": "url",
+                                    "name": "Django",
+                                    "url": "https://www.djangoproject.com/",
+                                }
+                            ],
+                        },
+                    ],
+                },
+                "sync_transaction_version": "1",
+            }
+        }
+        bookmarks = list(importer.parse_json(io.StringIO(json.dumps(data))))
+        self.assertEqual(
+            [(b.url, b.title, b.category) for b in bookmarks],
+            [
+                ("https://example.com/", "Example", "Bookmarks bar"),
+                ("https://www.djangoproject.com/", "Django", "Dev"),
+            ],
+        )
+        self.assertEqual(
+            bookmarks[0].created_at.isoformat(), "2024-01-01T00:00:00+00:00"
+        )
+
+    def test_firefox_json(self):
+        data = {
+            "title": "",
+            "type": "text/x-moz-place-container",
+            "children": [
+                {
+                    "title": "menu",
+                    "type": "text/x-moz-place-container",
+                    "children": [
+                        {
+                            "title": "Example",
+                            "type": "text/x-moz-place",
+                            "uri": "https://example.com/",
+                            "tags": "a,b",
+                            "dateAdded": 1704067200 * 1000000,
+                        },
+                        {"title": "separator", "type": "text/x-moz-place-separator"},
+                    ],
+                }
+            ],
+        }
+        bookmarks = list(importer.parse_json(io.StringIO(json.dumps(data))))
+        self.assertEqual(len(bookmarks), 1)
+        self.assertEqual(bookmarks[0].category, "menu")
+        self.assertEqual(bookmarks[0].tags, ["a", "b"])
+        self.assertEqual(bookmarks[0].created_at.year, 2024)
+
+    def test_detect_format(self):
+        self.assertEqual(importer.detect_format("bookmarks.html"), "html")
+        self.assertEqual(importer.detect_format("Bookmarks.JSONL"), "jsonl")
+        self.assertEqual(importer.detect_format("backup.json"), "json")
+
+
+class ImportBookmarksTests(TestCase):
+    def test_skips_invalid_and_duplicates(self):
+        Item.objects.create(url="https://existing.example/", title="Existing")
+        lines = [
+            {"url": "https://a.example/"},
+            {"url": "javascript:alert(1)"},
+            {"url": "https://x.com:99999/"},
+            {"url": "http://[::1"},
+            {"url": "not a url"},
+            # 既に登録済み（正規化すると同じ URL）
+            {"url": "http://EXISTING.example"},
+            # 同じバッチ内の重複
+            {"url": "https://a.example/?utm_source=feed"},
+            {"url": "https://b.example/"},
+            # 前のバッチで登録したものとの重複
+            {"url": "https://b.example"},
+            {"url": "https://c.example/"},
+        ]
+        stream = io.BytesIO("\n".join(json.dumps(line) for line in lines).encode())
+        result = importer.import_file(stream, format="jsonl", batch_size=8)
+        self.assertEqual((result.created, result.skipped), (3, 7))
+        self.assertEqual(
+            set(Item.objects.values_list("url", flat=True)),
+            {
+                "https://existing.example/",
+                "https://a.example/",
+                "https://b.example/",
+                "https://c.example/",
+            },
+        )
+
+
+class FakeResponse:
+    def __init__(self, body, content_type="text/html", url="https://example.com/"):
+        self.body = body
+        self.headers = {"Content-Type": content_type}
+        self.url = url
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start : start + chunk_size]
+
+    def close(self):
+        pass
+
+
+class ExtractorTests(SimpleTestCase):
+    def test_bogus_meta_charset(self):
+        for charset in ("x-bogus", "base64"):
+            with self.subTest(charset=charset):
+                body = (
+                    f'<html><head><meta charset="{charset}">'
+                    "<title>タイトル</title></head><body></body></html>"
+                ).encode()
+                self.assertEqual(sniff_charset(body), "utf-8")
+                page = extract_metadata(FakeResponse(body))
+                self.assertEqual(page.title, "タイトル")
+
+    def test_undecodable_guess_falls_back_to_utf8(self):
+        guess = mock.Mock(encoding="x-unknown")
+        with mock.patch("bookmark.extractor.from_bytes") as from_bytes:
+            from_bytes.return_value.best.return_value = guess
+            self.assertEqual(sniff_charset(b"\x85\x40"), "utf-8")
+
+    def test_meta_charset(self):
+        body = (
+            '<html><head><meta charset="shift_jis"><title>日本語</title></head>'
+        ).encode("shift_jis")
+        self.assertEqual(extract_metadata(FakeResponse(body)).title, "日本語")
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        created_at = timezone.now() - timedelta(days=1)
+        # 同じ登録日時のアイテムがページの境目をまたぐようにする
+        for i in range(7):
+            Item.objects.create(
+                url=f"https://example.com/{i}",
+                title=str(i),
+                created_at=created_at if i < 5 else created_at + timedelta(hours=i),
+            )
+
+    def pages(self, ordering, per_page=2):
+        ids = []
+        cursor = ""
+        while True:
+            page = paginate_keyset(
+                Item.objects.all(), cursor, per_page=per_page, ordering=ordering
+            )
+            ids.extend(item.id for item in page.items)
+            if not page.has_next:
+                return ids
+            cursor = page.next_cursor
+
+    def test_cursor_round_trip(self):
+        values = {"created_at": "2024-01-01T00:00:00+00:00", "id": 42}
+        self.assertEqual(decode_cursor(encode_cursor(values)), values)
+
+    def test_all_items_once(self):
+        for ordering in ("id", "created"):
+            with self.subTest(ordering=ordering):
+                ids = self.pages(ordering)
+                expected = list(
+                    Item.objects.order_by(
+                        *(("-created_at", "-id") if ordering == "created" else ("-id",))
+                    ).values_list("id", flat=True)
+                )
+                self.assertEqual(ids, expected)
+
+    def test_invalid_cursor_is_first_page(self):
+        invalid = [
+            "not base64!",
+            base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+            encode_cursor([1, 2]),
+            encode_cursor({}),
+            encode_cursor({"id": "abc"}),
+            encode_cursor({"id": 10**30}),
+            encode_cursor({"id": -1.5}),
+            encode_cursor({"id": True}),
+        ]
+        # id は正しいが登録日時が不正（登録日時の順でだけ使う）
+        invalid_created = [
+            encode_cursor({"id": 3, "created_at": "yesterday"}),
+            encode_cursor({"id": 3, "created_at": "2024-01-01T00:00:00"}),
+            encode_cursor({"id": 3, "created_at": 12}),
+        ]
+        cases = [(cursor, "id") for cursor in invalid] + [
+            (cursor, "created") for cursor in invalid + invalid_created
+        ]
+        for cursor, ordering in cases:
+            with self.subTest(cursor=cursor, ordering=ordering):
+                first = paginate_keyset(Item.objects.all(), "", ordering=ordering)
+                page = paginate_keyset(Item.objects.all(), cursor, ordering=ordering)
+                self.assertEqual(page.items, first.items)
+
+    def test_view_with_tampered_cursor(self):
+        user = get_user_model().objects.create_user("viewer")
+        self.client.force_login(user)
+        cursor = encode_cursor({"id": 10**30, "created_at": "x"})
+        for url in ("/", "/items/?layout=card&order=created"):
+            with self.subTest(url=url):
+                response = self.client.get(url, {"cursor": cursor})
+                self.assertEqual(response.status_code, 200)
+
+
+class SearchTests(TestCase):
+    def test_index_created_by_migration(self):
+        django = Item.objects.create(
+            url="https://www.djangoproject.com/", title="Django フレームワーク"
+        )
+        Item.objects.create(url="https://flask.palletsprojects.com/", title="Flask")
+        self.assertEqual(search_ids("フレームワーク"), [django.id])
+        self.assertEqual(search_ids("djangoproject"), [django.id])
+
+
+class SidebarTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="News")
+
+    def counts(self):
+        return {c["name"]: c["item_count"] for c in sidebar.get_categories()}
+
+    def test_invalidated_after_commit(self):
+        self.assertEqual(self.counts(), {"News": 0})
+        with self.captureOnCommitCallbacks() as callbacks:
+            item = Item.objects.create(
+                url="https://example.com/", title="Example", category=self.category
+            )
+            # コミット前に読み直しても古いキャッシュのまま（古い件数を入れ直さない）
+            self.assertEqual(self.counts(), {"News": 0})
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.counts(), {"News": 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item.delete()
+        self.assertEqual(self.counts(), {"News": 0})
+
+    def test_bulk_create_inside_transaction(self):
+        self.assertEqual(self.counts(), {"News": 0})
+        url = "https://example.com/"
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                importer.create_bookmarks(
+                    [(importer.ImportedBookmark(url, category="News"), url_hash(url))]
+                )
+                self.assertEqual(self.counts(), {"News": 0})
+        self.assertEqual(self.counts(), {"News": 1})
+
+
+class FacetCountTests(TestCase):
+    def setUp(self):
+        self.a, self.b, self.c = (
+            Tag.objects.create(name=name) for name in ("a", "b", "c")
+        )
+        self.news, self.blog = (
+            Category.objects.create(name=name) for name in ("news", "blog")
+        )
+        self.item = Item.objects.create(
+            url="https://example.com/1", title="One", category=self.news
+        )
+        self.other = Item.objects.create(url="https://example.com/2", title="Two")
+
+    def assertCounts(self, tags, categories):
+        self.assertEqual(dict(Tag.objects.values_list("name", "item_count")), tags)
+        self.assertEqual(
+            dict(Category.objects.values_list("name", "item_count")), categories
+        )
+
+    def test_tags(self):
+        self.item.tags.add(self.a, self.b)
+        self.item.tags.add(self.a)
+        self.other.tags.add(self.a)
+        self.assertCounts({"a": 2, "b": 1, "c": 0}, {"news": 1, "blog": 0})
+        # 付いていないタグを外しても減らない
+        self.item.tags.remove(self.a, self.c)
+        self.assertCounts({"a": 1, "b": 1, "c": 0}, {"news": 1, "blog": 0})
+        self.item.tags.clear()
+        self.assertCounts({"a": 1, "b": 0, "c": 0}, {"news": 1, "blog": 0})
+
+    def test_tags_reverse(self):
+        self.c.tags.add(self.item, self.other)
+        self.assertCounts({"a": 0, "b": 0, "c": 2}, {"news": 1, "blog": 0})
+        self.c.tags.remove(self.item)
+        self.assertCounts({"a": 0, "b": 0, "c": 1}, {"news": 1, "blog": 0})
+        self.c.tags.clear()
+        self.assertCounts({"a": 0, "b": 0, "c": 0}, {"news": 1, "blog": 0})
+
+    def test_category_change(self):
+        item = Item.objects.get(pk=self.item.pk)
+        item.category = self.blog
+        item.save()
+        self.assertCounts({"a": 0, "b": 0, "c": 0}, {"news": 0, "blog": 1})
+        item.category = None
+        item.save(update_fields=["category"])
+        self.assertCounts({"a": 0, "b": 0, "c": 0}, {"news": 0, "blog": 0})
+        # カテゴリ以外の保存では変わらない
+        item.title = "Edited"
+        item.save(update_fields=["title"])
+        self.other.save()
+        self.assertCounts({"a": 0, "b": 0, "c": 0}, {"news": 0, "blog": 0})
+
+    def test_delete(self):
+        self.item.tags.add(self.a, self.b)
+        self.other.tags.add(self.a)
+        self.item.delete()
+        self.assertCounts({"a": 1, "b": 0, "c": 0}, {"news": 0, "blog": 0})
+
+    def test_reconcile(self):
+        self.item.tags.add(self.a)
+        Tag.objects.filter(pk=self.a.pk).update(item_count=5)
+        Tag.objects.filter(pk=self.b.pk).update(item_count=3)
+        Category.objects.filter(pk=self.blog.pk).update(item_count=2)
+        self.assertEqual(facets.reconcile(), {"tags": 2, "categories": 1})
+        self.assertCounts({"a": 1, "b": 0, "c": 0}, {"news": 1, "blog": 0})
+        self.assertEqual(facets.reconcile(), {"tags": 0, "categories": 0})
+
+
+@override_settings(
+    FRAGMENT_CACHE=True,
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+)
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        fragments.reset_stats()
+        category = Category.objects.create(name="news")
+        tag = Tag.objects.create(name="python")
+        for i in range(40):
+            item = Item.objects.create(
+                url=f"https://example.com/{i}", title=f"Item {i}", category=category
+            )
+            item.tags.add(tag)
+
+    def items(self, count=40):
+        return list(Item.objects.for_listing().order_by("id")[:count])
+
+    def render(self, item):
+        (html,) = fragments.render_items(
+            [Item.objects.for_listing().get(pk=item.pk)], "card"
+        )
+        return html
+
+    def test_queries(self):
+        for count in (5, 40):
+            with self.subTest(count=count):
+                cache.clear()
+                items = self.items(count)
+                # キャッシュが空でも件数によらずタグの先読みの1回だけ
+                with self.assertNumQueries(1):
+                    cold = fragments.render_items(items, "card")
+                items = self.items(count)
+                with self.assertNumQueries(0):
+                    warm = fragments.render_items(items, "card")
+                self.assertEqual(warm, cold)
+        self.assertEqual(
+            fragments.stats(),
+            {"enabled": True, "hits": 45, "misses": 45, "hit_rate": 0.5},
+        )
+
+    @override_settings(FRAGMENT_CACHE=False)
+    def test_disabled(self):
+        for _ in range(2):
+            items = self.items()
+            with self.assertNumQueries(1):
+                fragments.render_items(items, "list")
+        self.assertEqual(fragments.stats()["enabled"], False)
+        self.assertEqual(fragments.stats()["hits"], 0)
+
+    def test_invalidation(self):
+        item = Item.objects.get(title="Item 0")
+        self.assertIn("Item 0", self.render(item))
+
+        item.title = "Edited"
+        item.save()
+        self.assertIn("Edited", self.render(item))
+
+        item.tags.add(Tag.objects.create(name="django"))
+        self.assertIn("#django", self.render(item))
+        tag = Tag.objects.get(name="python")
+        tag.name = "py"
+        tag.save()
+        self.assertIn("#py\n", self.render(item))
+
+        item.og_image = "og/new.jpg"
+        item.save(update_fields=["og_image"])
+        self.assertIn('src="/og/new.jpg"', self.render(item))
+        self.assertEqual(fragments.stats()["hits"], 0)
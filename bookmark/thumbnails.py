@@ -0,0 +1,75 @@
+"""OGP画像・ファビコンの縮小版（WebP）の生成
+
+縮小版は元ファイルと同じディレクトリに「<元のファイル名>.<幅>w.webp」の名前で保存する。
+元ファイルの名前から一意に決まるので、どの幅が存在するかを DB に持つ必要はない。
+"""
+
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.images import get_image_dimensions
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# カード（最大で画面幅いっぱい）とリスト（高さ 80px）で使う幅
+OG_IMAGE_WIDTHS = (160, 320, 640, 960)
+# 24px で表示するファビコン用
+FAVICON_WIDTHS = (32, 64)
+WEBP_QUALITY = 80
+
+
+def widths_for(name: str):
+    return FAVICON_WIDTHS if "/favicons/" in name else OG_IMAGE_WIDTHS
+
+
+def variant_name(name: str, width: int) -> str:
+    root, _ = posixpath.splitext(name)
+    return f"{root}.{width}w.webp"
+
+
+def available_widths(name: str, original_width) -> list:
+    """元画像より小さい縮小版の幅（元画像より大きくは拡大しない）"""
+    if not original_width:
+        return []
+    return [width for width in widths_for(name) if width < original_width]
+
+
+def image_size(storage, name):
+    """画像の幅と高さ。読めない形式（SVG など）の場合は (None, None)"""
+    try:
+        with storage.open(name) as file:
+            return get_image_dimensions(file, close=True)
+    except (OSError, ValueError):
+        return None, None
+
+
+def generate_variants(storage, name: str) -> bool:
+    """縮小版を生成して保存する。既にある幅は作り直さない"""
+    try:
+        with storage.open(name) as file, Image.open(file) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ("RGB", "RGBA"):
+                has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+                image = image.convert("RGBA" if has_alpha else "RGB")
+
+            for width in available_widths(name, image.width):
+                target = variant_name(name, width)
+                if storage.exists(target):
+                    continue
+                resized = image.copy()
+                resized.thumbnail((width, image.height), Image.LANCZOS)
+                buffer = BytesIO()
+                resized.save(buffer, "WEBP", quality=WEBP_QUALITY, method=4)
+                storage.save_derived(target, ContentFile(buffer.getvalue()))
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.info("Could not generate thumbnails for %s: %s", name, e)
+        return False
+    return True
+
+
+def delete_variants(storage, name: str) -> None:
+    for width in widths_for(name):
+        storage.delete_derived(variant_name(name, width))
@@ -0,0 +1,59 @@
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """同じページを指す表記ゆれ（大文字小文字・既定ポート・フラグメント）をそろえる"""
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        # 範囲外のポートや閉じていない IPv6 アドレスなど。そろえずにそのまま返す
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    netloc = host if port in (None, DEFAULT_PORTS.get(scheme)) else f"{host}:{port}"
+    if parts.username:
+        userinfo = parts.username
+        if parts.password:
+            userinfo += f":{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+# 同じページを指すのにアクセス解析のために付けられるパラメータ
+TRACKING_PARAM_PREFIXES = ("utm_",)
+TRACKING_PARAMS = {"fbclid", "gclid", "yclid", "msclkid", "mc_cid", "mc_eid", "igshid"}
+
+
+def canonicalize_url(url: str) -> str:
+    """重複判定用の正規形
+
+    normalize_url に加えて http を https に、末尾のスラッシュを除き、
+    トラッキング用のパラメータを除いて残りのパラメータを並べ替える。
+    表示や取得には使わず、重複の判定（url_hash）にだけ使う。
+    解析できない URL は前後の空白を除いただけの値を返す（例外は送出しない）。
+    """
+    try:
+        parts = urlsplit(normalize_url(url))
+    except ValueError:
+        return url.strip()
+    scheme = "https" if parts.scheme == "http" else parts.scheme
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(
+        sorted(
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if key not in TRACKING_PARAMS
+            and not key.startswith(TRACKING_PARAM_PREFIXES)
+        )
+    )
+    return urlunsplit((scheme, parts.netloc, path, query, ""))
+
+
+def url_hash(url: str) -> str:
+    """正規形の SHA-256（Item.url_hash に保存して重複の検索に使う）"""
+    return hashlib.sha256(canonicalize_url(url).encode()).hexdigest()
@@ -9,11 +9,20 @@ urlpatterns = [
     path("edit/<int:pk>/", views.edit_view, name="edit"),
     path("delete/<int:pk>/", views.delete_view, name="delete"),
     path("quick-add/", views.quick_add_bookmark, name="quick_add_bookmark"),
+    path("import/", views.import_view, name="import"),
+    path("export/", views.export_view, name="export"),
+    path("tags/autocomplete/", views.tag_autocomplete, name="tag_autocomplete"),
+    path("facets/tags/", views.tag_facets, name="tag_facets"),
+    path("facets/categories/", views.category_facets, name="category_facets"),
+    path("fragments/stats/", views.fragment_stats, name="fragment_stats"),
     path("fetch-ogp/", views.fetch_ogp_data, name="fetch_ogp_data"),
     path(
         "category/<str:str>/", views.item_list_by_category, name="item_list_by_category"
     ),
     path("card/", ItemListView.as_view(), name="card"),
+    path("items/", views.item_page, name="item_page"),
+    path("search/", views.search_view, name="search"),
+    path("search.json", views.search_api, name="search_api"),
     path("list/", views.list, name="list"),
     path("", views.list, name="index"),
 ]
@@ -1,73 +1,160 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.urls import reverse
 from django.views.generic import ListView
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from django.core.files.base import ContentFile
 import json
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+import logging
+from urllib.parse import urlencode, urljoin
 
-from .forms import BookmarkForm
-from .models import Category, Item, Tag
+from config import http
+
+from . import exporter, facets, fragments, sidebar, tag_index
+from .forms import BookmarkForm, ImportForm
+from .importer import import_file
+from .models import Item
+from .ogp import get_ogp
+from .pagination import ORDERINGS, estimate_count, paginate_keyset
+from .search import search, search_ids
+from .taxonomy import clean_names, resolve_categories, resolve_tags, split_names
+
+logger = logging.getLogger(__name__)
+
+# レイアウトごとの1ページの件数
+LAYOUTS = {"card": 12, "list": 50}
 
 
 class ItemListView(LoginRequiredMixin, ListView):
     template_name = "bookmark/view_card.html"
     model = Item
     context_object_name = "items"
-    paginate_by = 12
+
+    def get_queryset(self):
+        return Item.objects.for_listing()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context.update(paginate(self.request, self.object_list, "card"))
         context.update(get_common_data())
-        paginator = context["paginator"]
-        page = context["page_obj"]
-        context["page_range"] = paginator.get_elided_page_range(
-            page.number, on_each_side=1, on_ends=1
-        )
         return context
 
 
 def list(request):
-    context = {
-        "items": Item.objects.all(),
-    }
+    context = paginate(request, Item.objects.for_listing(), "list")
     context.update(get_common_data())
     return render(request, "bookmark/view_list.html", context)
 
 
 def item_list_by_category(request, str):
-    context = {
-        "items": Item.objects.filter(category__name=str),
-    }
+    queryset = Item.objects.for_listing().filter(category__name=str)
+    context = paginate(request, queryset, "list", category=str)
     context.update(get_common_data())
     return render(request, "bookmark/view_list.html", context)
 
 
+def search_view(request):
+    query = request.GET.get("q", "").strip()
+    context = {"query": query, "items": search(query) if query else []}
+    context.update(get_common_data())
+    return render(request, "bookmark/search.html", context)
+
+
+def search_api(request):
+    """検索結果を関連度順に JSON で返す API"""
+    query = request.GET.get("q", "").strip()
+    try:
+        limit = max(1, min(int(request.GET.get("limit", 20)), 100))
+    except ValueError:
+        return JsonResponse({"error": "limit must be an integer"}, status=400)
+    ids = search_ids(query, limit) if query else []
+    items = Item.objects.filter(id__in=ids).select_related("category")
+    items = {item.id: item for item in items}
+    results = [
+        {
+            "id": item.id,
+            "url": item.url,
+            "title": item.title,
+            "description": item.description or item.og_description,
+            "category": item.category.name if item.category else None,
+        }
+        for item in (items[pk] for pk in ids if pk in items)
+    ]
+    return JsonResponse({"query": query, "results": results})
+
+
+def item_page(request):
+    """無限スクロール用に次のページの HTML 断片とカーソルを返す API"""
+    layout = request.GET.get("layout", "list")
+    if layout not in LAYOUTS:
+        return JsonResponse({"error": "Unknown layout"}, status=400)
+    queryset = Item.objects.for_listing()
+    category = request.GET.get("category", "")
+    if category:
+        queryset = queryset.filter(category__name=category)
+
+    context = paginate(request, queryset, layout, category=category)
+    html = render_to_string(
+        "bookmark/components/items.html",
+        {"items": context["items"], "layout": layout},
+        request=request,
+    )
+    return JsonResponse(
+        {
+            "html": html,
+            "has_next": context["has_next"],
+            "next_cursor": context["next_cursor"],
+            "more_url": context["more_url"],
+            "total": context["total"],
+        }
+    )
+
+
+def paginate(request, queryset, layout, category=""):
+    """キーセットページングで一覧を取得し、テンプレートと API で使うコンテキストを返す
+
+    件数は PostgreSQL の統計情報による概算で、?count=1 の場合だけ正確に数える。
+    ?link=broken の場合はリンク切れのアイテムだけにする。
+    """
+    order = request.GET.get("order", "id")
+    if order not in ORDERINGS:
+        order = "id"
+    link = request.GET.get("link", "")
+    if link == "broken":
+        queryset = queryset.filter(link_broken=True)
+    page = paginate_keyset(
+        queryset,
+        cursor=request.GET.get("cursor", ""),
+        per_page=LAYOUTS[layout],
+        ordering=order,
+    )
+    total = queryset.count() if request.GET.get("count") else estimate_count(queryset)
+    params = {"layout": layout, "order": order, "cursor": page.next_cursor}
+    if category:
+        params["category"] = category
+    if link == "broken":
+        params["link"] = link
+    return {
+        "items": page.items,
+        "has_next": page.has_next,
+        "next_cursor": page.next_cursor,
+        "more_url": f"{reverse('bookmark:item_page')}?{urlencode(params)}",
+        "total": total,
+    }
+
+
 def edit_view(request, pk):
     obj = get_object_or_404(Item, pk=pk)
     if request.method == "POST":
         form = BookmarkForm(request.POST, instance=obj)
         if form.is_valid():
-            bookmark = form.save()
-
-            # 新規カテゴリの処理
-            new_category = form.cleaned_data.get("new_category")
-            if new_category:
-                category, created = Category.objects.get_or_create(name=new_category)
-                bookmark.category = category
-
-            # 新規タグの処理
-            new_tags = form.cleaned_data.get("new_tags")
-            if new_tags:
-                tags = [tag.strip() for tag in new_tags.split(",")]
-                for tag_name in tags:
-                    tag, created = Tag.objects.get_or_create(name=tag_name)
-                    bookmark.tags.add(tag)
+            bookmark = form.save(commit=False)
+            apply_new_category(bookmark, form)
             bookmark.save()
+            form.save_m2m()
+            add_new_tags(bookmark, form)
             return redirect("bookmark:index")
     else:
         form = BookmarkForm(instance=obj)
@@ -87,9 +174,50 @@ def delete_view(request, pk):
     return render(request, "delete_confirm_template.html", context)
 
 
+def apply_new_category(bookmark, form):
+    """新規カテゴリが入力されていればアイテムに設定する（保存は呼び出し側で行う）"""
+    names = clean_names([form.cleaned_data.get("new_category")])
+    if names:
+        bookmark.category = resolve_categories(names)[names[0]]
+
+
+def add_new_tags(bookmark, form):
+    """カンマ区切りの新規タグをまとめて作成・取得し、1回でアイテムに追加する"""
+    tags = resolve_tags(split_names(form.cleaned_data.get("new_tags") or ""))
+    if tags:
+        bookmark.tags.add(*tags.values())
+
+
+def tag_autocomplete(request):
+    """タグ名の前方一致検索（入力補完用）"""
+    try:
+        limit = max(1, min(int(request.GET.get("limit", 10)), 50))
+    except ValueError:
+        return JsonResponse({"error": "limit must be an integer"}, status=400)
+    return JsonResponse({"tags": tag_index.complete(request.GET.get("q", ""), limit)})
+
+
+def tag_facets(request):
+    """アイテム数の多いタグ（上位 limit 件）"""
+    try:
+        limit = max(1, min(int(request.GET.get("limit", 20)), 200))
+    except ValueError:
+        return JsonResponse({"error": "limit must be an integer"}, status=400)
+    return JsonResponse({"tags": facets.top_tags(limit)})
+
+
+def category_facets(request):
+    """カテゴリごとのアイテム数"""
+    return JsonResponse({"categories": sidebar.get_categories()})
+
+
+def fragment_stats(request):
+    """一覧の HTML 断片のキャッシュのヒット率"""
+    return JsonResponse(fragments.stats())
+
+
 def get_common_data():
-    category_list = Category.objects.all()
-    return {"category_list": category_list}
+    return {"category_list": sidebar.get_categories()}
 
 
 @csrf_exempt
@@ -107,86 +235,8 @@ def fetch_ogp_data(request):
             if not url.startswith(("http://", "https://")):
                 url = "https://" + url
 
-            # メタデータを取得
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
-            response = requests.get(url, timeout=10, verify=False, headers=headers)
-
-            # エンコーディングを適切に処理
-            if response.encoding == "ISO-8859-1":
-                # ISO-8859-1の場合はUTF-8として扱うことが多い
-                response.encoding = "utf-8"
-
-            # エンコーディングが不明な場合はUTF-8を試す
-            if not response.encoding or response.encoding.lower() == "iso-8859-1":
-                try:
-                    content = response.content.decode("utf-8")
-                except UnicodeDecodeError:
-                    # UTF-8でデコードできない場合は、他のエンコーディングを試す
-                    for encoding in ["shift_jis", "euc-jp", "iso-2022-jp", "cp932"]:
-                        try:
-                            content = response.content.decode(encoding)
-                            break
-                        except UnicodeDecodeError:
-                            continue
-                    else:
-                        # すべて失敗した場合はUTF-8で強制デコード（エラーを無視）
-                        content = response.content.decode("utf-8", errors="ignore")
-            else:
-                content = response.text
-
-            soup = BeautifulSoup(content, "html.parser", from_encoding="utf-8")
-
-            # 基本情報
-            title = soup.find("title")
-            title_text = title.get_text(strip=True) if title else ""
-
-            # OGP情報
-            og_data = {}
-            og_tags = [
-                "og:title",
-                "og:description",
-                "og:image",
-                "og:type",
-                "og:site_name",
-                "og:url",
-            ]
-
-            for tag in og_tags:
-                meta = soup.find("meta", property=tag)
-                if meta and meta.get("content"):
-                    content = meta.get("content", "").strip()
-                    if content:
-                        og_data[tag.replace("og:", "")] = content
-
-            # ファビコン
-            favicon = soup.find("link", rel="icon") or soup.find(
-                "link", rel="shortcut icon"
-            )
-            favicon_url = ""
-            if favicon and favicon.get("href"):
-                favicon_url = urljoin(url, favicon["href"])
-
-            # 説明文（OGP descriptionがない場合はmeta descriptionを使用）
-            description = og_data.get("description", "").strip()
-            if not description:
-                meta_desc = soup.find("meta", attrs={"name": "description"})
-                if meta_desc:
-                    description = meta_desc.get("content", "").strip()
-
-            result = {
-                "url": url,
-                "title": og_data.get("title", title_text),
-                "description": description,
-                "image": og_data.get("image", ""),
-                "type": og_data.get("type", ""),
-                "site_name": og_data.get("site_name", ""),
-                "favicon_url": favicon_url,
-                "success": True,
-            }
-
-            return JsonResponse(result)
+            result = get_ogp(url)
+            return JsonResponse(result, status=200 if result["success"] else 500)
 
         except Exception as e:
             return JsonResponse({"error": str(e), "success": False}, status=500)
@@ -201,9 +251,16 @@ def quick_add_bookmark(request):
     if "title" in request.GET:
         initial_data["title"] = request.GET["title"]
 
+    duplicate = None
     if request.method == "POST":
         form = BookmarkForm(request.POST)
         if form.is_valid():
+            # 正規化した URL のハッシュで登録済みかを確認する（インデックスで1件引くだけ）
+            duplicate = Item.objects.find_duplicate(form.cleaned_data["url"])
+            if duplicate:
+                context = {"form": form, "duplicate": duplicate}
+                context.update(get_common_data())
+                return render(request, "bookmark/quick_add_bookmark.html", context)
             bookmark = form.save(commit=False)
 
             # OGP情報を設定
@@ -217,52 +274,67 @@ def quick_add_bookmark(request):
             og_image_url = form.cleaned_data.get("og_image", "")
             if og_image_url:
                 try:
-                    import requests
-                    from urllib.parse import urljoin
-                    from django.core.files.base import ContentFile
-
                     # 画像URLを絶対URLに変換
                     if not og_image_url.startswith(("http://", "https://")):
                         og_image_url = urljoin(bookmark.url, og_image_url)
 
                     # 画像をダウンロードして保存
-                    response = requests.get(og_image_url, timeout=10, verify=False)
+                    response = http.fetch(og_image_url, verify=False)
                     if response.status_code == 200:
-                        image_name = og_image_url.split("/")[-1]
-                        if not image_name or "." not in image_name:
-                            image_name = "og_image.jpg"
-                        bookmark.og_image.save(
-                            image_name, ContentFile(response.content), save=False
-                        )
-                except Exception as e:
-                    print(f"Error downloading OGP image: {e}")
+                        bookmark.set_og_image(og_image_url, response.content)
+                except Exception as e:  # noqa: BLE001
+                    logger.warning(
+                        "Error downloading OGP image %s: %s", og_image_url, e
+                    )
 
+            apply_new_category(bookmark, form)
             bookmark.save()
-
-            # 新規カテゴリの処理
-            new_category = form.cleaned_data.get("new_category")
-            if new_category:
-                category, created = Category.objects.get_or_create(name=new_category)
-                bookmark.category = category
-
-            # tagsの処理
-            tags = form.cleaned_data.get("tags")
-            if tags:
-                bookmark.tags.set(tags)
-
-            # 新規タグの処理
-            new_tags = form.cleaned_data.get("new_tags")
-            if new_tags:
-                tags = [tag.strip() for tag in new_tags.split(",")]
-                for tag_name in tags:
-                    tag, created = Tag.objects.get_or_create(name=tag_name)
-                    bookmark.tags.add(tag)
-            bookmark.save()
+            form.save_m2m()
+            add_new_tags(bookmark, form)
 
             return redirect("bookmark:index")
     else:
         form = BookmarkForm(initial=initial_data)
+        if initial_data.get("url"):
+            duplicate = Item.objects.find_duplicate(initial_data["url"])
 
-    context = {"form": form}
+    context = {"form": form, "duplicate": duplicate}
     context.update(get_common_data())
     return render(request, "bookmark/quick_add_bookmark.html", context)
+
+
+def import_view(request):
+    """ブラウザのエクスポートファイルからブックマークを一括登録する"""
+    result = None
+    if request.method == "POST":
+        form = ImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            result = import_file(
+                form.cleaned_data["file"],
+                format=form.cleaned_data["format"] or None,
+                default_category=form.cleaned_data["category"],
+            )
+            form = ImportForm()
+    else:
+        form = ImportForm()
+    context = {"form": form, "result": result}
+    context.update(get_common_data())
+    return render(request, "bookmark/import.html", context)
+
+
+def export_view(request):
+    """ブックマークを JSON Lines / CSV / Netscape 形式の HTML でダウンロードする"""
+    format = request.GET.get("format", "jsonl")
+    if format not in exporter.FORMATS:
+        return JsonResponse({"error": "Unknown format"}, status=400)
+    content_type, extension = exporter.FORMATS[format]
+    queryset = Item.objects.all()
+    category = request.GET.get("category", "")
+    if category:
+        queryset = queryset.filter(category__name=category)
+    response = StreamingHttpResponse(
+        exporter.export(format, queryset),
+        content_type=f"{content_type}; charset=utf-8",
+    )
+    response["Content-Disposition"] = f'attachment; filename="bookmarks.{extension}"'
+    return response
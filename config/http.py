@@ -0,0 +1,161 @@
+"""外部サイトへの HTTP 通信で共有するクライアント
+
+ホストごとのコネクションプールを持つ requests.Session をプロセス内で使い回し、
+タイムアウト・リトライ・User-Agent・レスポンスサイズ上限を揃える。
+"""
+
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+)
+# (接続タイムアウト, 読み込みタイムアウト) 秒
+DEFAULT_TIMEOUT = (5, 15)
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class ResponseTooLarge(requests.RequestException):
+    """レスポンスが上限サイズを超えた"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def build_session() -> requests.Session:
+    retry = Retry(
+        total=_setting("HTTP_CLIENT_RETRIES", 2),
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        # pool_connections はプールを保持するホスト数、pool_maxsize はホストごとの接続数
+        pool_connections=_setting("HTTP_CLIENT_POOL_HOSTS", 50),
+        pool_maxsize=_setting("HTTP_CLIENT_POOL_SIZE", 10),
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = _setting(
+        "HTTP_CLIENT_USER_AGENT", DEFAULT_USER_AGENT
+    )
+    return session
+
+
+def get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    kwargs.setdefault("timeout", _setting("HTTP_CLIENT_TIMEOUT", DEFAULT_TIMEOUT))
+    return get_session().request(method, url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """共有セッションで GET する。本文を読み切るまで接続はプールに戻らない点に注意"""
+    return request("GET", url, **kwargs)
+
+
+def conditional_headers(etag: str = "", last_modified: str = "") -> dict:
+    """前回のレスポンスのバリデータから条件付きリクエストのヘッダーを作る"""
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+def read_limited(response: requests.Response, max_bytes: int | None = None) -> bytes:
+    """上限サイズまで本文を読み込む。超えた場合は ResponseTooLarge を送出する"""
+    if max_bytes is None:
+        max_bytes = _setting("HTTP_CLIENT_MAX_BYTES", DEFAULT_MAX_BYTES)
+    length = response.headers.get("Content-Length")
+    if length and length.isdigit() and int(length) > max_bytes:
+        response.close()
+        raise ResponseTooLarge(f"Response too large: {length} bytes", response=response)
+
+    chunks = []
+    size = 0
+    try:
+        for chunk in response.iter_content(CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise ResponseTooLarge(
+                    f"Response exceeds {max_bytes} bytes", response=response
+                )
+            chunks.append(chunk)
+    finally:
+        response.close()
+    return b"".join(chunks)
+
+
+def fetch(url: str, max_bytes: int | None = None, **kwargs) -> requests.Response:
+    """GET して上限サイズまで本文を読み込んだレスポンスを返す（response.content が使える）"""
+    response = get(url, stream=True, **kwargs)
+    response._content = read_limited(response, max_bytes)
+    return response
+
+
+def host_of(url: str) -> str:
+    """URL のホスト名（小文字）。解析できない URL は空文字列"""
+    try:
+        return (urlsplit(url).hostname or "").lower()
+    except ValueError:
+        return ""
+
+
+class HostLimiter:
+    """ホストごとの同時リクエスト数を制限する（スレッド間で共有して使う）"""
+
+    def __init__(self, per_host: int):
+        self.per_host = per_host
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    @contextmanager
+    def limit(self, url: str):
+        host = host_of(url)
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = self._semaphores[host] = threading.BoundedSemaphore(
+                    self.per_host
+                )
+        with semaphore:
+            yield
+
+
+def interleave_by_host(objects, get_url):
+    """同じホストが続かないように並べ替える（ホスト待ちでワーカーが詰まるのを防ぐ）"""
+    groups = {}
+    for obj in objects:
+        groups.setdefault(host_of(get_url(obj)), []).append(obj)
+    queues = list(groups.values())
+    result = []
+    while queues:
+        for queue in queues:
+            result.append(queue.pop(0))
+        queues = [queue for queue in queues if queue]
+    return result
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
     "mptt",
     "adminsortable2",
     "rest_framework",
+    "rest_framework.authtoken",
 ]
 
 MIDDLEWARE = [
@@ -118,6 +119,44 @@ DATABASES = {
 }
 
 
+# 外部サイトへの HTTP 通信（config/http.py）
+
+HTTP_CLIENT_TIMEOUT = (5, 15)
+HTTP_CLIENT_RETRIES = 2
+HTTP_CLIENT_MAX_BYTES = 10 * 1024 * 1024
+HTTP_CLIENT_POOL_HOSTS = 50
+HTTP_CLIENT_POOL_SIZE = 10
+
+
+# Cache
+# ワーカー間で共有できるキャッシュを使う（既定はデータベース。python manage.py createcachetable が必要）
+# 例: CACHE_URL=memcache://127.0.0.1:11211, CACHE_URL=filecache:///var/tmp/django_cache
+
+CACHES = {"default": env.cache("CACHE_URL", default="dbcache://django_cache")}
+
+# 一覧の HTML 断片のキャッシュ（bookmark/fragments.py）
+# ページ単位の get_many / set_many が1往復で済むバックエンド（memcached, Redis）でだけ有効にする。
+# データベースやファイルのキャッシュではキーごとに読み書きするため、かえって遅くなる
+FRAGMENT_CACHE = env.bool(
+    "FRAGMENT_CACHE",
+    default=any(
+        name in CACHES["default"]["BACKEND"].lower() for name in ("memcached", "redis")
+    ),
+)
+
+
+# REST API（bookmark/api.py）
+# ブラウザ拡張などからは Authorization: Token <key> で認証する（トークンは管理画面で発行）
+
+REST_FRAMEWORK = {
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "rest_framework.authentication.SessionAuthentication",
+        "rest_framework.authentication.TokenAuthentication",
+    ],
+    "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAuthenticated"],
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -10,6 +10,7 @@ urlpatterns = (
         path("accounts/", include("allauth.urls")),
         path("rss/", include("rssreader.urls")),
         path("inquiry/", include("inquiry.urls")),
+        path("api/", include("bookmark.api_urls")),
         path("", include("bookmark.urls")),
     ]
     + static(settings.STATIC_URL, document_root=settings.STATICFILES_DIRS)
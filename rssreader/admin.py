@@ -1,3 +1,8 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Entry, EntryRead, Feed, Subscription
+
+admin.site.register(Feed)
+admin.site.register(Entry)
+admin.site.register(Subscription)
+admin.site.register(EntryRead)
@@ -0,0 +1,5 @@
+from django import forms
+
+
+class SubscribeForm(forms.Form):
+    url = forms.URLField(label="フィードの URL", max_length=2000)
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from rssreader.poller import poll_due
+
+
+class Command(BaseCommand):
+    help = "購読しているフィードを定期的に並列で取得するワーカー"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="取得時刻が来たフィードを取得したら終了する",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=100, help="1回に取得するフィード数"
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=16, help="全体の同時リクエスト数"
+        )
+        parser.add_argument(
+            "--per-host", type=int, default=2, help="ホストごとの同時リクエスト数"
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=30.0,
+            help="取得するフィードがない場合の待機秒数",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                stats = poll_due(
+                    limit=options["batch_size"],
+                    concurrency=options["concurrency"],
+                    per_host=options["per_host"],
+                )
+                if stats.feeds:
+                    self.stdout.write(stats.summary())
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+        except KeyboardInterrupt:
+            self.stdout.write("ワーカーを停止しました")
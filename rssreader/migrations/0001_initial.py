@@ -0,0 +1,72 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Feed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=2000, unique=True, verbose_name='URL')),
+                ('title', models.CharField(blank=True, max_length=512, verbose_name='タイトル')),
+                ('site_url', models.URLField(blank=True, max_length=2000, verbose_name='サイト URL')),
+                ('description', models.TextField(blank=True, verbose_name='説明')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='登録日時')),
+                ('last_fetched_at', models.DateTimeField(blank=True, null=True, verbose_name='最終取得日時')),
+                ('next_fetch_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='次回取得日時')),
+                ('last_error', models.TextField(blank=True, verbose_name='エラー')),
+            ],
+            options={
+                'verbose_name_plural': 'フィード',
+            },
+        ),
+        migrations.CreateModel(
+            name='Subscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='登録日時')),
+                ('feed', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subscriptions', to='rssreader.feed')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_subscriptions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': '購読',
+            },
+        ),
+        migrations.CreateModel(
+            name='Entry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('guid', models.CharField(max_length=2000)),
+                ('title', models.CharField(blank=True, max_length=512, verbose_name='タイトル')),
+                ('link', models.URLField(blank=True, max_length=2000, verbose_name='リンク')),
+                ('summary', models.TextField(blank=True, verbose_name='概要')),
+                ('published_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='公開日時')),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='取得日時')),
+                ('feed', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='rssreader.feed')),
+            ],
+            options={
+                'verbose_name_plural': 'エントリー',
+                'ordering': ('-published_at', '-id'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.UniqueConstraint(fields=('user', 'feed'), name='rssreader_subscription_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['feed', '-published_at'], name='rssreader_e_feed_id_b467e1_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:30
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("rssreader", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="feed",
+            name="content_hash",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="feed",
+            name="error_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="連続エラー数"),
+        ),
+        migrations.AddField(
+            model_name="feed",
+            name="etag",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="feed",
+            name="fetch_interval",
+            field=models.DurationField(
+                default=datetime.timedelta(seconds=1800), verbose_name="取得間隔"
+            ),
+        ),
+        migrations.AddField(
+            model_name="feed",
+            name="last_modified",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
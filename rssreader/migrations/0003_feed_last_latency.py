@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rssreader', '0002_feed_conditional_get'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='last_latency_ms',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='応答時間(ms)'),
+        ),
+    ]
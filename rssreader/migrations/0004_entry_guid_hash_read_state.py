@@ -0,0 +1,104 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:37
+
+import hashlib
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def entry_key(guid, link='', title=''):
+    # rssreader.models.entry_key をこの時点のものとして固定する
+    value = guid if guid else f'{link}\n{title}'
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def fill_guid_hash(apps, schema_editor):
+    Entry = apps.get_model('rssreader', 'Entry')
+    last_id = 0
+    while True:
+        entries = list(
+            Entry.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .only('id', 'guid', 'link', 'title')[:1000]
+        )
+        if not entries:
+            break
+        last_id = entries[-1].id
+        for entry in entries:
+            # guid がない場合、これまではリンク（なければタイトル）を guid にしていた。
+            # リンクと同じ guid は RSS 1.0 の rdf:about やパーマリンクの guid と
+            # 区別できないので guid のまま残し、タイトルを使っていたものだけ
+            # 今後の取得と同じキーになるよう guid を空にしてタイトルから作る
+            if not entry.link and entry.guid == entry.title:
+                entry.guid = ''
+            entry.guid_hash = entry_key(entry.guid, entry.link, entry.title)
+        Entry.objects.bulk_update(entries, ['guid', 'guid_hash'])
+
+    # 一意制約がなかったため、取得が重なると同じエントリーが複数保存されていることがある。
+    # 最初に保存したものを残して消す
+    duplicates = (
+        Entry.objects.values('feed_id', 'guid_hash')
+        .annotate(first_id=models.Min('id'), count=models.Count('id'))
+        .filter(count__gt=1)
+        .order_by()
+    )
+    for duplicate in duplicates:
+        Entry.objects.filter(
+            feed_id=duplicate['feed_id'], guid_hash=duplicate['guid_hash']
+        ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('rssreader', '0003_feed_last_latency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntryRead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'verbose_name_plural': '既読',
+            },
+        ),
+        migrations.AddField(
+            model_name='entry',
+            name='guid_hash',
+            field=models.CharField(default='', max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='subscription',
+            name='read_until_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='entry',
+            name='guid',
+            field=models.CharField(blank=True, max_length=2000),
+        ),
+        migrations.RunPython(fill_guid_hash, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='entry',
+            constraint=models.UniqueConstraint(fields=('feed', 'guid_hash'), name='rssreader_entry_guid_unique'),
+        ),
+        migrations.AddField(
+            model_name='entryread',
+            name='entry',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reads', to='rssreader.entry'),
+        ),
+        migrations.AddField(
+            model_name='entryread',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='entryread',
+            constraint=models.UniqueConstraint(fields=('user', 'entry'), name='rssreader_entryread_unique'),
+        ),
+    ]
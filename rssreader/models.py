@@ -1,3 +1,201 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def entry_key(guid: str, link: str = "", title: str = "") -> str:
+    """エントリーを識別するハッシュ。guid がない場合はリンクとタイトルから作る"""
+    value = guid if guid else f"{link}\n{title}"
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+class FeedQuerySet(models.QuerySet):
+    def due(self, now=None):
+        """取得する時刻が来たフィード（古い順）"""
+        now = now or timezone.now()
+        return self.filter(next_fetch_at__lte=now).order_by("next_fetch_at")
+
+
+class Feed(models.Model):
+    # 取得する間隔（最初の値。以降は公開の頻度に合わせて MIN から MAX の間で調整する）
+    FETCH_INTERVAL = timedelta(minutes=30)
+    MIN_FETCH_INTERVAL = timedelta(minutes=15)
+    MAX_FETCH_INTERVAL = timedelta(days=1)
+    # エラーが続く場合は間隔を倍々に延ばし、DEAD_AFTER_ERRORS 回続くか 410 Gone なら
+    # 止まったフィードとして DEAD_INTERVAL ごとにだけ確認する
+    ERROR_BACKOFF_MAX = timedelta(days=1)
+    DEAD_AFTER_ERRORS = 10
+    DEAD_INTERVAL = timedelta(days=7)
+
+    url = models.URLField("URL", max_length=2000, unique=True)
+    title = models.CharField("タイトル", max_length=512, blank=True)
+    site_url = models.URLField("サイト URL", max_length=2000, blank=True)
+    description = models.TextField("説明", blank=True)
+    created_at = models.DateTimeField("登録日時", default=timezone.now, editable=False)
+    last_fetched_at = models.DateTimeField("最終取得日時", null=True, blank=True)
+    next_fetch_at = models.DateTimeField(
+        "次回取得日時", default=timezone.now, db_index=True
+    )
+    fetch_interval = models.DurationField("取得間隔", default=FETCH_INTERVAL)
+    last_error = models.TextField("エラー", blank=True)
+    error_count = models.PositiveIntegerField("連続エラー数", default=0)
+    last_latency_ms = models.PositiveIntegerField("応答時間(ms)", null=True, blank=True)
+
+    # 条件付きリクエスト用（ETag / Last-Modified / 本文の SHA-256）
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+
+    objects = FeedQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = "フィード"
+
+    def __str__(self) -> str:
+        return self.title or self.url
+
+    @property
+    def is_dead(self) -> bool:
+        return self.error_count >= self.DEAD_AFTER_ERRORS
+
+
+class EntryQuerySet(models.QuerySet):
+    def with_read_state(self, user):
+        """is_read（ユーザーが既読か）を付ける"""
+        read_until = Subscription.objects.filter(
+            user=user, feed=models.OuterRef("feed")
+        ).values("read_until_id")[:1]
+        return self.annotate(
+            is_read=models.ExpressionWrapper(
+                models.Q(id__lte=Coalesce(models.Subquery(read_until), 0))
+                | models.Exists(
+                    EntryRead.objects.filter(user=user, entry=models.OuterRef("pk"))
+                ),
+                output_field=models.BooleanField(),
+            )
+        )
+
+    def unread(self, user):
+        return self.with_read_state(user).filter(is_read=False)
+
+
+class Entry(models.Model):
+    feed = models.ForeignKey(Feed, on_delete=models.CASCADE, related_name="entries")
+    # RSS の guid / Atom の id / RSS 1.0 の rdf:about（ない場合は空）
+    guid = models.CharField(max_length=2000, blank=True)
+    # entry_key() の値。フィード内の重複の判定と一括 upsert のキーに使う
+    guid_hash = models.CharField(max_length=64)
+    title = models.CharField("タイトル", max_length=512, blank=True)
+    link = models.URLField("リンク", max_length=2000, blank=True)
+    summary = models.TextField("概要", blank=True)
+    # フィードに日時がない場合は取得した日時
+    published_at = models.DateTimeField("公開日時", default=timezone.now)
+    fetched_at = models.DateTimeField("取得日時", default=timezone.now, editable=False)
+
+    objects = EntryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = "エントリー"
+        ordering = ("-published_at", "-id")
+        indexes = [models.Index(fields=["feed", "-published_at"])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["feed", "guid_hash"], name="rssreader_entry_guid_unique"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return self.title or self.link
+
+
+class SubscriptionQuerySet(models.QuerySet):
+    def with_unread_counts(self):
+        """unread_count（未読のエントリー数）を付ける。購読の一覧と合わせて1クエリで数える"""
+        unread = (
+            Entry.objects.filter(
+                feed=models.OuterRef("feed"), id__gt=models.OuterRef("read_until_id")
+            )
+            .exclude(
+                models.Exists(
+                    EntryRead.objects.filter(
+                        user=models.OuterRef(models.OuterRef("user")),
+                        entry=models.OuterRef("pk"),
+                    )
+                )
+            )
+            .order_by()
+            .values("feed")
+            .annotate(count=models.Count("id"))
+            .values("count")
+        )
+        return self.annotate(unread_count=Coalesce(models.Subquery(unread), 0))
+
+
+class Subscription(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="feed_subscriptions",
+    )
+    feed = models.ForeignKey(
+        Feed, on_delete=models.CASCADE, related_name="subscriptions"
+    )
+    created_at = models.DateTimeField("登録日時", default=timezone.now, editable=False)
+    # この ID までのエントリーは既読（「すべて既読にする」で進める）。
+    # これより新しいエントリーの既読は EntryRead に1件ずつ記録する
+    read_until_id = models.BigIntegerField(default=0)
+
+    objects = SubscriptionQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = "購読"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "feed"], name="rssreader_subscription_unique"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.user} - {self.feed}"
+
+    def mark_all_read(self) -> None:
+        """フィードのエントリーをすべて既読にする"""
+        latest = (
+            Entry.objects.filter(feed=models.OuterRef("feed"))
+            .order_by("-id")
+            .values("id")[:1]
+        )
+        Subscription.objects.filter(pk=self.pk).update(
+            read_until_id=Coalesce(models.Subquery(latest), models.F("read_until_id"))
+        )
+        # ウォーターマーク以下になった個別の既読は不要なので消す
+        EntryRead.objects.filter(
+            user_id=self.user_id, entry__feed_id=self.feed_id
+        ).delete()
+
+
+class EntryRead(models.Model):
+    """購読のウォーターマーク（read_until_id）より新しいエントリーの既読"""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    entry = models.ForeignKey(Entry, on_delete=models.CASCADE, related_name="reads")
+
+    class Meta:
+        verbose_name_plural = "既読"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "entry"], name="rssreader_entryread_unique"
+            )
+        ]
 
-# Create your models here.
+    @classmethod
+    def mark(cls, user, entries) -> None:
+        cls.objects.bulk_create(
+            [cls(user=user, entry=entry) for entry in entries], ignore_conflicts=True
+        )
@@ -0,0 +1,209 @@
+"""RSS 0.9x / 1.0 (RDF) / 2.0 と Atom フィードの逐次解析
+
+ElementTree.iterparse で先頭から読み進め、エントリーを1件解析するごとに要素を
+破棄するため、フィードの大きさに関係なくメモリ使用量は一定に保たれる。
+読み込むバイト数とエントリー数には上限がある（フィードは新しい順なので、
+上限を超えた古いエントリーは読まない）。
+
+parse_feed() が返す ParsedFeed の entries はジェネレーターで、フィードのタイトルなどは
+entries を最後まで読むと揃う（通常はエントリーより前に書かれているので先に揃う）。
+"""
+
+import io
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from xml.etree import ElementTree as ET
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+RSS1 = "{http://purl.org/rss/1.0/}"
+RSS090 = "{http://my.netscape.com/rdf/simple/0.9/}"
+RDF = "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}"
+DC = "{http://purl.org/dc/elements/1.1/}"
+CONTENT = "{http://purl.org/rss/1.0/modules/content/}"
+
+MAX_BYTES = 10 * 1024 * 1024
+MAX_ENTRIES = 500
+READ_SIZE = 64 * 1024
+
+# 要素名（名前空間付き）ごとの分類
+CHANNEL_TAGS = {"channel", f"{RSS1}channel", f"{RSS090}channel", f"{ATOM}feed"}
+ENTRY_TAGS = {"item", f"{RSS1}item", f"{RSS090}item", f"{ATOM}entry"}
+ROOT_TAGS = {"rss", f"{RDF}RDF", f"{ATOM}feed"}
+
+
+class FeedParseError(Exception):
+    """フィードとして解析できない（上限を超えた場合を含む）"""
+
+
+@dataclass
+class ParsedEntry:
+    guid: str = ""
+    title: str = ""
+    link: str = ""
+    summary: str = ""
+    published_at: datetime = None
+
+
+@dataclass
+class ParsedFeed:
+    title: str = ""
+    site_url: str = ""
+    description: str = ""
+    entries: object = field(default_factory=list)
+
+
+class _LimitedReader(io.RawIOBase):
+    """max_bytes を超えて読もうとすると FeedParseError を送出する"""
+
+    def __init__(self, source, max_bytes):
+        self.source = source
+        self.remaining = max_bytes
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.source.read(min(len(buffer), READ_SIZE))
+        self.remaining -= len(data)
+        if self.remaining < 0:
+            raise FeedParseError("Feed is too large")
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def normalize_date(value: str):
+    """RFC 822（RSS）と ISO 8601 / W3CDTF（Atom, dc:date）の日時を UTC に揃える"""
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    try:
+        return parsed.astimezone(timezone.utc)
+    except OverflowError:
+        # 0001-01-01T00:00:00+05:00 など、UTC にすると datetime の範囲を超える
+        return None
+
+
+def _text(element) -> str:
+    if element is None:
+        return ""
+    # Atom の type="xhtml" は子要素の中にテキストがある
+    return "".join(element.itertext()).strip()
+
+
+def _child_text(element, *tags) -> str:
+    """tags のうち最初に値がある子要素のテキスト"""
+    for tag in tags:
+        value = _text(element.find(tag))
+        if value:
+            return value
+    return ""
+
+
+def _atom_link(element) -> str:
+    for link in element.findall(f"{ATOM}link"):
+        if link.get("rel", "alternate") == "alternate":
+            return link.get("href", "").strip()
+    return ""
+
+
+def _link(element) -> str:
+    return _atom_link(element) or _child_text(
+        element, "link", f"{RSS1}link", f"{RSS090}link"
+    )
+
+
+def _parse_entry(element):
+    link = _link(element)
+    title = _child_text(
+        element, "title", f"{RSS1}title", f"{RSS090}title", f"{ATOM}title"
+    )
+    guid = (
+        _child_text(element, "guid", f"{ATOM}id")
+        or element.get(f"{RDF}about", "").strip()
+    )
+    # guid がないエントリーはリンクとタイトルで識別する（models.entry_key）
+    if not (guid or link or title):
+        return None
+    return ParsedEntry(
+        guid=guid,
+        title=title,
+        link=link,
+        summary=_child_text(
+            element,
+            "description",
+            f"{RSS1}description",
+            f"{ATOM}summary",
+            f"{CONTENT}encoded",
+            f"{ATOM}content",
+        ),
+        published_at=normalize_date(
+            _child_text(
+                element, "pubDate", f"{ATOM}published", f"{DC}date", f"{ATOM}updated"
+            )
+        ),
+    )
+
+
+def _set_channel_field(feed, element) -> None:
+    tag = element.tag
+    if tag in ("title", f"{RSS1}title", f"{RSS090}title", f"{ATOM}title"):
+        feed.title = feed.title or _text(element)
+    elif tag in ("link", f"{RSS1}link", f"{RSS090}link"):
+        feed.site_url = feed.site_url or _text(element)
+    elif tag == f"{ATOM}link" and element.get("rel", "alternate") == "alternate":
+        feed.site_url = feed.site_url or element.get("href", "").strip()
+    elif tag in ("description", f"{RSS1}description", f"{ATOM}subtitle"):
+        feed.description = feed.description or _text(element)
+
+
+def _iter_entries(source, feed, max_bytes, max_entries):
+    reader = io.BufferedReader(_LimitedReader(source, max_bytes), READ_SIZE)
+    # 開いている要素のスタック（解析済みのエントリーを親から外すのに使う）
+    stack = []
+    count = 0
+    try:
+        for event, element in ET.iterparse(reader, events=("start", "end")):
+            if event == "start":
+                if not stack and element.tag not in ROOT_TAGS:
+                    raise FeedParseError(f"Unknown feed format: {element.tag}")
+                stack.append(element)
+                continue
+
+            stack.pop()
+            parent = stack[-1] if stack else None
+            if element.tag in ENTRY_TAGS:
+                entry = _parse_entry(element)
+                if parent is not None:
+                    parent.remove(element)
+                element.clear()
+                if entry is None:
+                    continue
+                yield entry
+                count += 1
+                if count >= max_entries:
+                    return
+            elif parent is not None and parent.tag in CHANNEL_TAGS:
+                _set_channel_field(feed, element)
+                # チャンネルの子要素（画像やカテゴリなど）も読み終えたら捨てる
+                parent.remove(element)
+    except ET.ParseError as e:
+        raise FeedParseError(str(e)) from e
+
+
+def parse_feed(source, max_bytes=MAX_BYTES, max_entries=MAX_ENTRIES) -> ParsedFeed:
+    """フィードを解析する。source はバイト列または読み込み可能なバイナリのファイル"""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    feed = ParsedFeed()
+    feed.entries = _iter_entries(source, feed, max_bytes, max_entries)
+    return feed
@@ -0,0 +1,336 @@
+"""フィードの定期取得（poll_feeds コマンドから実行する）
+
+ページの表示ではリモートのサーバーにアクセスせず、ここで保存したエントリーを表示する。
+取得はスレッドプールで並列に行い、データベースへの書き込みはメインスレッドで行う。
+"""
+
+import hashlib
+import logging
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import timedelta
+from itertools import islice
+
+from django.utils import timezone
+
+from config import http
+from config.http import HostLimiter, interleave_by_host
+
+from .models import Entry, Feed, entry_key
+from .parser import MAX_BYTES, READ_SIZE, FeedParseError, parse_feed
+
+logger = logging.getLogger(__name__)
+
+# 取得中のフィードを他のワーカーが取らないよう、次回取得日時をこの分だけ先にしておく
+LOCK_TIMEOUT = timedelta(minutes=5)
+# 取得間隔を決めるのに使う最近のエントリー数
+RECENT_ENTRIES = 20
+# 次回取得日時を前後にずらす割合
+JITTER = 0.1
+# 本文はこの大きさまではメモリ、超えたら一時ファイルに置く
+SPOOL_SIZE = 1024 * 1024
+# 解析しながらこの件数ずつ保存する
+STORE_BATCH_SIZE = 100
+
+
+def claim(feed: Feed) -> bool:
+    """フィードを取得中にする。他のワーカーが先に取得していた場合は False"""
+    claimed = Feed.objects.filter(pk=feed.pk, next_fetch_at=feed.next_fetch_at).update(
+        next_fetch_at=timezone.now() + LOCK_TIMEOUT
+    )
+    return claimed == 1
+
+
+def store_entries(feed: Feed, entries) -> int:
+    """エントリーを保存し、新しく保存した件数を返す
+
+    entries はジェネレーターでもよく、STORE_BATCH_SIZE 件ずつ読みながら保存する。
+    (feed, guid_hash) の一意制約を使って1バッチ1回の upsert（INSERT ... ON CONFLICT）で
+    書き込み、既にあるエントリーはタイトル・リンク・概要だけを更新する。
+    """
+    before = feed.entries.count()
+    entries = iter(entries)
+    while batch := list(islice(entries, STORE_BATCH_SIZE)):
+        now = timezone.now()
+        # 同じ文の中で同じキーを2回書くことはできないので、バッチ内の重複は先勝ちで除く
+        objs = {}
+        for entry in batch:
+            guid = entry.guid[:2000]
+            title = entry.title[:512]
+            link = entry.link[:2000]
+            guid_hash = entry_key(guid, link, title)
+            if guid_hash in objs:
+                continue
+            objs[guid_hash] = Entry(
+                feed=feed,
+                guid=guid,
+                guid_hash=guid_hash,
+                title=title,
+                link=link,
+                summary=entry.summary,
+                # 未来の日時（時計のずれ）は取得した日時に揃える
+                published_at=min(entry.published_at or now, now),
+                fetched_at=now,
+            )
+        Entry.objects.bulk_create(
+            list(objs.values()),
+            update_conflicts=True,
+            unique_fields=["feed", "guid_hash"],
+            update_fields=["title", "link", "summary"],
+        )
+    return feed.entries.count() - before
+
+
+def adaptive_interval(feed: Feed, now) -> timedelta:
+    """最近のエントリーの公開間隔から次の取得までの間隔を決める
+
+    公開間隔の中央値の半分にする（平均して間隔の半分以内の遅れで取得できる）。
+    しばらく公開がない場合は、最後の公開からの経過時間に合わせて延ばす。
+    """
+    published = list(
+        feed.entries.order_by("-published_at").values_list("published_at", flat=True)[
+            :RECENT_ENTRIES
+        ]
+    )
+    if len(published) < 2:
+        return Feed.FETCH_INTERVAL
+    gaps = sorted(newer - older for newer, older in zip(published, published[1:]))
+    interval = max(gaps[len(gaps) // 2] / 2, (now - published[0]) / 4)
+    return min(max(interval, Feed.MIN_FETCH_INTERVAL), Feed.MAX_FETCH_INTERVAL)
+
+
+def error_interval(feed: Feed) -> timedelta:
+    """連続したエラーの回数に応じた次の取得までの間隔（指数バックオフ）"""
+    if feed.is_dead:
+        return Feed.DEAD_INTERVAL
+    return min(feed.fetch_interval * 2**feed.error_count, Feed.ERROR_BACKOFF_MAX)
+
+
+@dataclass
+class FetchResult:
+    """ワーカースレッドでの取得結果（データベースへの書き込みはメインスレッドで行う）"""
+
+    feed: Feed
+    status: int | None = None
+    digest: str = ""
+    # 本文（前回から変わっていない場合は None）。解析はメインスレッドで保存しながら行う
+    body: tempfile.SpooledTemporaryFile | None = None
+    changed: bool = False
+    etag: str = ""
+    last_modified: str = ""
+    error: Exception | None = None
+    latency_ms: int = 0
+    size: int = 0
+
+
+@dataclass
+class PollStats:
+    """1回の取得サイクルの集計"""
+
+    feeds: int = 0
+    updated: int = 0
+    # 304 または本文のハッシュが同じ
+    not_modified: int = 0
+    errors: int = 0
+    entries: int = 0
+    size: int = 0
+    elapsed: float = 0.0
+    latencies: list = field(default_factory=list)
+    slowest: FetchResult | None = None
+
+    def add(self, result: FetchResult, created: int) -> None:
+        self.feeds += 1
+        self.entries += created
+        self.size += result.size
+        self.latencies.append(result.latency_ms)
+        if result.error is not None:
+            self.errors += 1
+        elif not result.changed:
+            self.not_modified += 1
+        else:
+            self.updated += 1
+        if self.slowest is None or result.latency_ms > self.slowest.latency_ms:
+            self.slowest = result
+
+    def summary(self) -> str:
+        if not self.feeds:
+            return "取得するフィードはありません"
+        latencies = sorted(self.latencies)
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return (
+            f"{self.feeds} 件 (更新 {self.updated}, 変更なし {self.not_modified}, "
+            f"エラー {self.errors}) 新着 {self.entries} 件, {self.size // 1024} KiB, "
+            f"{self.elapsed:.1f} 秒, 応答 p50 {p50} ms / p95 {p95} ms, "
+            f"最も遅い {self.slowest.feed.url} ({self.slowest.latency_ms} ms)"
+        )
+
+
+def jittered(interval: timedelta) -> timedelta:
+    """取得時刻が同じ時刻に集中しないよう、間隔を前後に少しずらす"""
+    return interval * random.uniform(1 - JITTER, 1 + JITTER)
+
+
+def fetch(feed: Feed) -> FetchResult:
+    """フィードを取得する。データベースには触れないのでワーカースレッドで実行できる
+
+    前回の ETag / Last-Modified で条件付きリクエストを送る。本文はハッシュを計算しながら
+    一時ファイルに書き出し、前回と同じ場合は解析しない。
+    """
+    result = FetchResult(feed)
+    started = time.monotonic()
+    try:
+        response = http.get(
+            feed.url,
+            stream=True,
+            headers=http.conditional_headers(feed.etag, feed.last_modified),
+        )
+        try:
+            result.status = response.status_code
+            if response.status_code != 304:
+                response.raise_for_status()
+                result.etag = response.headers.get("ETag", "")[:255]
+                result.last_modified = response.headers.get("Last-Modified", "")[:64]
+                _spool(response, result)
+        finally:
+            response.close()
+    except Exception as e:  # noqa: BLE001
+        # 1件の失敗でサイクル全体を止めない
+        result.error = e
+    finally:
+        result.latency_ms = int((time.monotonic() - started) * 1000)
+    return result
+
+
+def _spool(response, result: FetchResult) -> None:
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    digest = hashlib.sha256()
+    try:
+        for chunk in response.iter_content(READ_SIZE):
+            result.size += len(chunk)
+            if result.size > MAX_BYTES:
+                raise http.ResponseTooLarge(
+                    f"Response exceeds {MAX_BYTES} bytes", response=response
+                )
+            digest.update(chunk)
+            body.write(chunk)
+    except BaseException:
+        body.close()
+        raise
+    result.digest = digest.hexdigest()
+    if result.digest == result.feed.content_hash:
+        body.close()
+        return
+    body.seek(0)
+    result.body = body
+    result.changed = True
+
+
+def _store_body(feed: Feed, result: FetchResult) -> int:
+    """本文を逐次解析しながらエントリーを保存し、保存した件数を返す"""
+    parsed = parse_feed(result.body)
+    created = store_entries(feed, parsed.entries)
+    # entries を読み終えるとフィードのタイトルなどが揃う
+    feed.title = parsed.title[:512] or feed.title
+    feed.site_url = parsed.site_url[:2000] or feed.site_url
+    feed.description = parsed.description or feed.description
+    feed.content_hash = result.digest
+    return created
+
+
+def apply(result: FetchResult) -> int:
+    """取得結果を保存して次回の取得日時を決め、保存したエントリー数を返す"""
+    feed = result.feed
+    now = timezone.now()
+    feed.last_latency_ms = result.latency_ms
+    created = 0
+    if result.body is not None:
+        try:
+            created = _store_body(feed, result)
+        except FeedParseError as e:
+            # 途中までに保存したエントリーはそのまま残す（次回は同じ行を更新する）
+            result.error = e
+        except Exception as e:  # noqa: BLE001
+            # データベースのエラーなど想定外のものも、このフィードのエラーとして記録する
+            logger.exception("Error storing feed %s", feed.url)
+            result.error = e
+        finally:
+            result.body.close()
+
+    if result.error is not None:
+        logger.warning("Error fetching feed %s: %s", feed.url, result.error)
+        if result.status == 410:
+            # 削除されたフィード
+            feed.error_count = max(feed.error_count + 1, Feed.DEAD_AFTER_ERRORS)
+        else:
+            feed.error_count += 1
+        feed.last_error = str(result.error)
+        feed.next_fetch_at = now + jittered(error_interval(feed))
+        feed.save(
+            update_fields=[
+                "error_count",
+                "last_error",
+                "next_fetch_at",
+                "last_latency_ms",
+            ]
+        )
+        return created
+
+    if result.status != 304:
+        # 解析に失敗した場合は次回も本文を取得し直せるよう、成功した場合だけ更新する
+        feed.etag = result.etag
+        feed.last_modified = result.last_modified
+    feed.last_fetched_at = now
+    feed.error_count = 0
+    feed.last_error = ""
+    feed.fetch_interval = adaptive_interval(feed, now)
+    feed.next_fetch_at = now + jittered(feed.fetch_interval)
+    feed.save()
+    return created
+
+
+def poll_feed(feed: Feed) -> int:
+    """フィードを取得して新しいエントリーを保存し、保存した件数を返す"""
+    return apply(fetch(feed))
+
+
+def poll_due(limit: int = 100, concurrency: int = 16, per_host: int = 2) -> PollStats:
+    """取得時刻が来たフィードを最大 limit 件並列に取得する
+
+    通信はスレッドプールで行い（全体で concurrency 件、同じホストへは per_host 件まで）、
+    終わったものから順にメインスレッドで本文を解析しながら保存する。
+    1サイクルの時間は最も遅いホストで決まる。
+    """
+    stats = PollStats()
+    started = time.monotonic()
+    feeds = [feed for feed in Feed.objects.due()[:limit] if claim(feed)]
+    if not feeds:
+        return stats
+
+    limiter = HostLimiter(per_host)
+
+    def run(feed):
+        with limiter.limit(feed.url):
+            return fetch(feed)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(run, feed)
+            for feed in interleave_by_host(feeds, lambda feed: feed.url)
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            try:
+                created = apply(result)
+            except Exception as e:  # noqa: BLE001
+                # エラーの記録にも失敗した場合。残りの結果の保存は続け、
+                # このフィードはロックが切れた後に取得し直す
+                logger.exception("Error applying feed %s", result.feed.url)
+                result.error = e
+                created = 0
+            stats.add(result, created)
+    stats.elapsed = time.monotonic() - started
+    return stats
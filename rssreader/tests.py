@@ -1,3 +1,319 @@
-from django.test import TestCase
+import io
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import poller
+from .models import Entry, EntryRead, Feed, Subscription, entry_key
+from .parser import FeedParseError, normalize_date, parse_feed
+
+RSS = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Feed</title>
+<item><guid>1</guid><title>First</title><link>https://example.com/1</link></item>
+</channel></rss>
+"""
+
+
+def fetched(feed):
+    return poller.FetchResult(
+        feed, status=200, digest="x", body=io.BytesIO(RSS), changed=True
+    )
+
+
+class PollDueTests(TestCase):
+    def setUp(self):
+        now = timezone.now() - timedelta(minutes=1)
+        self.feeds = [
+            Feed.objects.create(url=f"https://example.com/{i}.xml", next_fetch_at=now)
+            for i in range(3)
+        ]
+
+    def test_store_error_does_not_abort_cycle(self):
+        broken = self.feeds[1]
+        store_entries = poller.store_entries
+
+        def store(feed, entries):
+            if feed.pk == broken.pk:
+                raise IntegrityError("boom")
+            return store_entries(feed, entries)
+
+        with (
+            mock.patch.object(poller, "fetch", side_effect=fetched),
+            mock.patch.object(poller, "store_entries", side_effect=store),
+            self.assertLogs("rssreader.poller", "ERROR"),
+        ):
+            stats = poller.poll_due()
+
+        self.assertEqual((stats.feeds, stats.updated, stats.errors), (3, 2, 1))
+        broken.refresh_from_db()
+        self.assertEqual(broken.error_count, 1)
+        self.assertEqual(broken.last_error, "boom")
+        # ロックではなくエラー時の間隔で次回の取得日時が決まる
+        self.assertGreater(
+            broken.next_fetch_at,
+            timezone.now() + poller.LOCK_TIMEOUT,
+        )
+        for feed in (self.feeds[0], self.feeds[2]):
+            self.assertEqual(feed.entries.count(), 1)
+
+
+RSS2 = b"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/"
+     xmlns:dc="http://purl.org/dc/elements/1.1/">
+<channel>
+  <title>RSS 2.0</title>
+  <link>https://example.com/</link>
+  <description>Example feed</description>
+  <image><title>Logo</title><url>https://example.com/logo.png</url></image>
+  <item>
+    <guid isPermaLink="false">tag:example.com,2024:1</guid>
+    <title>First</title>
+    <link>https://example.com/1</link>
+    <pubDate>Mon, 01 Jan 2024 09:00:00 +0900</pubDate>
+    <content:encoded><![CDATA[<p>Full <b>content</b></p>]]></content:encoded>
+  </item>
+  <item>
+    <title>No guid</title>
+    <link>https://example.com/2</link>
+    <dc:date>2024-01-02T00:00:00Z</dc:date>
+    <description>Summary</description>
+  </item>
+  <item><description>Neither guid, link nor title</description></item>
+</channel>
+</rss>
+"""
+
+RDF = b"""<?xml version="1.0"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+         xmlns="http://purl.org/rss/1.0/"
+         xmlns:dc="http://purl.org/dc/elements/1.1/">
+  <channel rdf:about="https://example.com/">
+    <title>RSS 1.0</title>
+    <link>https://example.com/</link>
+    <description>RDF feed</description>
+  </channel>
+  <item rdf:about="https://example.com/a">
+    <title>A</title>
+    <link>https://example.com/a</link>
+    <dc:date>2024-01-03T12:00:00+09:00</dc:date>
+  </item>
+</rdf:RDF>
+"""
+
+ATOM = b"""<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <title>Atom</title>
+  <subtitle>Atom feed</subtitle>
+  <link rel="self" href="https://example.com/atom.xml"/>
+  <link href="https://example.com/"/>
+  <entry>
+    <id>urn:uuid:1</id>
+    <title type="xhtml"><div xmlns="http://www.w3.org/1999/xhtml">Entry <b>one</b></div></title>
+    <link rel="alternate" href="https://example.com/e1"/>
+    <updated>2024-01-04T00:00:00Z</updated>
+    <published>2024-01-03T00:00:00Z</published>
+    <summary>Atom summary</summary>
+  </entry>
+</feed>
+"""
+
+
+def rss_items(count):
+    items = b"".join(
+        b"<item><guid>%d</guid><title>Item %d</title></item>" % (i, i)
+        for i in range(count)
+    )
+    return b"<rss><channel><title>Many</title>%s</channel></rss>" % items
+
+
+class ParserTests(SimpleTestCase):
+    def test_rss2(self):
+        feed = parse_feed(RSS2)
+        entries = list(feed.entries)
+        self.assertEqual(
+            (feed.title, feed.site_url, feed.description),
+            ("RSS 2.0", "https://example.com/", "Example feed"),
+        )
+        self.assertEqual(len(entries), 2)
+        first, second = entries
+        self.assertEqual(first.guid, "tag:example.com,2024:1")
+        self.assertEqual(first.summary, "<p>Full <b>content</b></p>")
+        self.assertEqual(
+            first.published_at, datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        )
+        # guid がない場合は空のまま（リンクとタイトルで識別する）
+        self.assertEqual((second.guid, second.link), ("", "https://example.com/2"))
+        self.assertEqual(second.summary, "Summary")
+        self.assertEqual(
+            second.published_at, datetime(2024, 1, 2, tzinfo=dt_timezone.utc)
+        )
+
+    def test_rdf(self):
+        feed = parse_feed(io.BytesIO(RDF))
+        entries = list(feed.entries)
+        self.assertEqual((feed.title, feed.description), ("RSS 1.0", "RDF feed"))
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0].guid, "https://example.com/a")
+        self.assertEqual(entries[0].link, "https://example.com/a")
+        self.assertEqual(
+            entries[0].published_at, datetime(2024, 1, 3, 3, tzinfo=dt_timezone.utc)
+        )
+
+    def test_atom(self):
+        feed = parse_feed(ATOM)
+        entries = list(feed.entries)
+        self.assertEqual(
+            (feed.title, feed.site_url, feed.description),
+            ("Atom", "https://example.com/", "Atom feed"),
+        )
+        entry = entries[0]
+        self.assertEqual(
+            (entry.guid, entry.title, entry.link, entry.summary),
+            ("urn:uuid:1", "Entry one", "https://example.com/e1", "Atom summary"),
+        )
+        # published を updated より優先する
+        self.assertEqual(entry.published_at.day, 3)
+
+    def test_max_entries(self):
+        entries = list(parse_feed(rss_items(20), max_entries=5).entries)
+        self.assertEqual([entry.guid for entry in entries], ["0", "1", "2", "3", "4"])
+
+    def test_max_bytes(self):
+        with self.assertRaises(FeedParseError):
+            list(parse_feed(rss_items(2000), max_bytes=10 * 1024).entries)
+
+    def test_malformed(self):
+        for body in (b"<rss><channel><item></channel>", b"not xml", b"<html></html>"):
+            with self.subTest(body=body), self.assertRaises(FeedParseError):
+                list(parse_feed(body).entries)
+
+    def test_normalize_date(self):
+        self.assertEqual(
+            normalize_date("Mon, 01 Jan 2024 00:00:00 GMT"),
+            datetime(2024, 1, 1, tzinfo=dt_timezone.utc),
+        )
+        self.assertEqual(
+            normalize_date("2024-01-01T00:00:00"),
+            datetime(2024, 1, 1, tzinfo=dt_timezone.utc),
+        )
+        for value in (
+            "",
+            "yesterday",
+            "0001-01-01T00:00:00+05:00",
+            "Fri, 31 Dec 9999 23:00:00 -0500",
+        ):
+            with self.subTest(value=value):
+                self.assertIsNone(normalize_date(value))
+
+
+def rss_body(*items):
+    return b"<rss><channel><title>Feed</title>%s</channel></rss>" % b"".join(items)
+
+
+class StoreEntriesTests(TestCase):
+    def setUp(self):
+        self.feed = Feed.objects.create(url="https://example.com/feed.xml")
+
+    def store(self, *items):
+        return poller.store_entries(self.feed, parse_feed(rss_body(*items)).entries)
+
+    def test_upsert(self):
+        first = b"<item><guid>1</guid><title>One</title></item>"
+        no_guid = b"<item><title>Two</title><link>https://example.com/2</link></item>"
+        self.assertEqual(self.store(first, no_guid, first), 2)
+        edited = b"<item><guid>1</guid><title>Edited</title></item>"
+        self.assertEqual(self.store(edited, no_guid), 0)
+        self.assertEqual(
+            set(self.feed.entries.values_list("title", flat=True)), {"Edited", "Two"}
+        )
+        self.assertEqual(
+            self.feed.entries.get(title="Two").guid_hash,
+            entry_key("", "https://example.com/2", "Two"),
+        )
+
+
+class ReadStateTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("reader")
+        self.feed = Feed.objects.create(url="https://example.com/feed.xml")
+        self.subscription = Subscription.objects.create(user=self.user, feed=self.feed)
+        poller.store_entries(
+            self.feed,
+            parse_feed(
+                rss_body(
+                    *(
+                        b"<item><guid>%d</guid><title>%d</title></item>" % (i, i)
+                        for i in range(5)
+                    )
+                )
+            ).entries,
+        )
+
+    def unread_count(self):
+        with self.assertNumQueries(1):
+            return (
+                Subscription.objects.with_unread_counts()
+                .get(pk=self.subscription.pk)
+                .unread_count
+            )
+
+    def test_unread_count(self):
+        self.assertEqual(self.unread_count(), 5)
+        EntryRead.mark(self.user, self.feed.entries.all()[:2])
+        EntryRead.mark(self.user, self.feed.entries.all()[:1])
+        self.assertEqual(self.unread_count(), 3)
+        self.assertEqual(Entry.objects.unread(self.user).count(), 3)
+
+    def test_mark_all_read(self):
+        EntryRead.mark(self.user, self.feed.entries.all()[:1])
+        self.subscription.mark_all_read()
+        self.assertEqual(self.unread_count(), 0)
+        self.assertFalse(EntryRead.objects.exists())
+        poller.store_entries(
+            self.feed, parse_feed(rss_body(b"<item><guid>new</guid></item>")).entries
+        )
+        self.assertEqual(self.unread_count(), 1)
+        self.assertEqual(
+            list(Entry.objects.unread(self.user).values_list("guid", flat=True)),
+            ["new"],
+        )
+
+
+class OpenEntryTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("reader")
+        self.feed = Feed.objects.create(url="https://example.com/feed.xml")
+        Subscription.objects.create(user=self.user, feed=self.feed)
+        self.client.force_login(self.user)
+
+    def open(self, link):
+        entry = Entry.objects.create(
+            feed=self.feed, guid=link, guid_hash=entry_key(link), link=link
+        )
+        response = self.client.get(reverse("rssreader:open_entry", args=[entry.pk]))
+        self.assertTrue(EntryRead.objects.filter(entry=entry).exists())
+        return response
+
+    def test_redirects_to_link(self):
+        for link in ("https://example.com/1", "HTTP://example.com/2"):
+            with self.subTest(link=link):
+                self.assertRedirects(
+                    self.open(link), link, fetch_redirect_response=False
+                )
+
+    def test_unsafe_link(self):
+        for link in (
+            "",
+            "javascript:alert(1)",
+            "data:text/html,<script>alert(1)</script>",
+            "//evil.example.com/",
+            "http://[::1",
+        ):
+            with self.subTest(link=link):
+                self.assertRedirects(self.open(link), reverse("rssreader:index"))
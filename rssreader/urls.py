@@ -6,5 +6,8 @@ app_name = "rssreader"
 
 urlpatterns = [
     path("", views.index, name="index"),
+    path("feeds/<int:pk>/", views.feed_detail, name="feed_detail"),
+    path("feeds/<int:pk>/unsubscribe/", views.unsubscribe, name="unsubscribe"),
+    path("feeds/<int:pk>/mark-all-read/", views.mark_all_read, name="mark_all_read"),
+    path("entries/<int:pk>/open/", views.open_entry, name="open_entry"),
 ]
-
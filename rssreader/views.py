@@ -1,63 +1,90 @@
-from typing import Any, Dict, List
+from urllib.parse import urlsplit
 
+from django.contrib.auth.decorators import login_required
 from django.http import HttpRequest, HttpResponse
-from django.shortcuts import render
-import requests
-from xml.etree import ElementTree as ET
-
-
-def parse_feed(url: str) -> Dict[str, Any]:
-    response = requests.get(url, timeout=10)
-    response.raise_for_status()
-    content = response.content
-
-    root = ET.fromstring(content)
-
-    # Try RSS 2.0
-    channel = root.find("channel")
-    if channel is not None:
-        title = (channel.findtext("title") or "").strip()
-        description = (channel.findtext("description") or "").strip()
-        items: List[Dict[str, str]] = []
-        for item in channel.findall("item"):
-            items.append(
-                {
-                    "title": (item.findtext("title") or "").strip(),
-                    "link": (item.findtext("link") or "").strip(),
-                    "description": (item.findtext("description") or "").strip(),
-                }
-            )
-        return {"title": title, "description": description, "items": items}
-
-    # Try Atom
-    if root.tag.endswith("feed"):
-        ns_title = root.findtext("{http://www.w3.org/2005/Atom}title") or root.findtext("title") or ""
-        items = []
-        for entry in root.findall("{http://www.w3.org/2005/Atom}entry"):
-            link_href = ""
-            link_el = entry.find("{http://www.w3.org/2005/Atom}link")
-            if link_el is not None:
-                link_href = link_el.attrib.get("href", "")
-            items.append(
-                {
-                    "title": (entry.findtext("{http://www.w3.org/2005/Atom}title") or "").strip(),
-                    "link": link_href,
-                    "description": (entry.findtext("{http://www.w3.org/2005/Atom}summary") or "").strip(),
-                }
-            )
-        return {"title": ns_title.strip(), "description": "", "items": items}
-
-    return {"title": "", "description": "", "items": []}
+from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import require_POST
 
+from .forms import SubscribeForm
+from .models import Entry, EntryRead, Feed, Subscription
 
+# 1ページに表示するエントリー数
+ENTRIES_PER_PAGE = 50
+
+
+@login_required
 def index(request: HttpRequest) -> HttpResponse:
-    context: Dict[str, Any] = {"feed": None, "error": None}
-    if request.method == "POST":
-        url = request.POST.get("url", "").strip()
-        if url:
-            try:
-                context["feed"] = parse_feed(url)
-            except Exception as exc:  # noqa: BLE001
-                context["error"] = str(exc)
+    """購読しているフィードの新着エントリー。POST でフィードを購読する
+
+    フィードの取得は poll_feeds ワーカーが行い、ここではデータベースだけを読む。
+    ?unread=1 で未読のエントリーだけを表示する。
+    """
+    form = SubscribeForm(request.POST or None)
+    if request.method == "POST" and form.is_valid():
+        # 新しいフィードは次回取得日時が現在なので、ワーカーがすぐに取得する
+        feed, _ = Feed.objects.get_or_create(url=form.cleaned_data["url"])
+        Subscription.objects.get_or_create(user=request.user, feed=feed)
+        return redirect("rssreader:index")
+
+    subscriptions = (
+        Subscription.objects.filter(user=request.user)
+        .with_unread_counts()
+        .select_related("feed")
+        .order_by("feed__title", "feed__url")
+    )
+    unread_only = request.GET.get("unread") == "1"
+    entries = Entry.objects.filter(
+        feed__subscriptions__user=request.user
+    ).with_read_state(request.user)
+    if unread_only:
+        entries = entries.filter(is_read=False)
+    context = {
+        "form": form,
+        "subscriptions": subscriptions,
+        "entries": entries.select_related("feed")[:ENTRIES_PER_PAGE],
+        "unread_only": unread_only,
+    }
     return render(request, "rssreader/index.html", context)
 
+
+@login_required
+def feed_detail(request: HttpRequest, pk: int) -> HttpResponse:
+    subscription = get_object_or_404(
+        Subscription.objects.select_related("feed"), user=request.user, feed_id=pk
+    )
+    feed = subscription.feed
+    entries = feed.entries.with_read_state(request.user)[:ENTRIES_PER_PAGE]
+    context = {"feed": feed, "entries": entries}
+    return render(request, "rssreader/feed_detail.html", context)
+
+
+@login_required
+def open_entry(request: HttpRequest, pk: int) -> HttpResponse:
+    """エントリーを既読にしてリンク先に移動する"""
+    entry = get_object_or_404(
+        Entry.objects.only("id", "link"), pk=pk, feed__subscriptions__user=request.user
+    )
+    EntryRead.mark(request.user, [entry])
+    # フィードから取り込んだリンクなので javascript: などには移動しない
+    try:
+        scheme = urlsplit(entry.link).scheme.lower()
+    except ValueError:
+        scheme = ""
+    if scheme not in ("http", "https"):
+        return redirect("rssreader:index")
+    return redirect(entry.link)
+
+
+@login_required
+@require_POST
+def mark_all_read(request: HttpRequest, pk: int) -> HttpResponse:
+    subscription = get_object_or_404(Subscription, user=request.user, feed_id=pk)
+    subscription.mark_all_read()
+    return redirect("rssreader:feed_detail", pk=pk)
+
+
+@login_required
+@require_POST
+def unsubscribe(request: HttpRequest, pk: int) -> HttpResponse:
+    Subscription.objects.filter(user=request.user, feed_id=pk).delete()
+    return redirect("rssreader:index")
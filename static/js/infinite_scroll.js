@@ -0,0 +1,37 @@
+// 「Next」リンクが画面に入ったら次のページを取得して一覧の末尾に追加する
+document.addEventListener('DOMContentLoaded', function() {
+  var link = document.querySelector('[data-infinite-scroll]');
+  if (!link || !('IntersectionObserver' in window)) {
+    return;
+  }
+  var container = document.querySelector(link.dataset.target);
+  var loading = false;
+
+  var observer = new IntersectionObserver(function(entries) {
+    if (!entries[0].isIntersecting || loading) {
+      return;
+    }
+    loading = true;
+    fetch(link.dataset.infiniteScroll, { headers: { 'Accept': 'application/json' } })
+      .then(function(response) { return response.json(); })
+      .then(function(data) {
+        container.insertAdjacentHTML('beforeend', data.html);
+        if (data.has_next) {
+          link.dataset.infiniteScroll = data.more_url;
+          var url = new URL(window.location.href);
+          url.searchParams.set('cursor', data.next_cursor);
+          link.href = url.toString();
+        } else {
+          observer.disconnect();
+          link.parentElement.remove();
+        }
+        loading = false;
+      })
+      .catch(function(error) {
+        console.error('Error:', error);
+        observer.disconnect();
+      });
+  }, { rootMargin: '400px' });
+
+  observer.observe(link);
+});
@@ -0,0 +1,34 @@
+// data-tag-autocomplete を付けた入力欄で、カンマ区切りの最後の語に一致するタグを候補に出す
+document.addEventListener('DOMContentLoaded', function() {
+  document.querySelectorAll('[data-tag-autocomplete]').forEach(function(input, i) {
+    var list = document.createElement('datalist');
+    list.id = 'tag-autocomplete-' + i;
+    input.after(list);
+    input.setAttribute('list', list.id);
+
+    var timer = null;
+    input.addEventListener('input', function() {
+      clearTimeout(timer);
+      timer = setTimeout(function() {
+        var terms = input.value.split(/[,、，]/);
+        var prefix = terms.pop().trim();
+        if (!prefix) {
+          list.innerHTML = '';
+          return;
+        }
+        var head = terms.length ? terms.join(',') + ',' : '';
+        fetch(input.dataset.tagAutocomplete + '?q=' + encodeURIComponent(prefix))
+          .then(function(response) { return response.json(); })
+          .then(function(data) {
+            list.innerHTML = '';
+            data.tags.forEach(function(name) {
+              var option = document.createElement('option');
+              option.value = head + name;
+              list.appendChild(option);
+            });
+          })
+          .catch(function(error) { console.error('Error:', error); });
+      }, 150);
+    });
+  });
+});